@@ -1,24 +1,44 @@
-from langgraph.prebuilt import create_react_agent
-# from langchain.agents import load_tools, create_react_agent
+import asyncio
+import hashlib
+import importlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
+# LangChain, LangGraph, the chat models and the tool modules are imported on first use
+# (see get_tools and _build_agent), so importing the app stays fast and needs no API key.
 
-
-from app.tools.transcript import transcribe
-from app.tools.video_downloader import download_video
-from app.tools.book_hotel import book_hotel
-from app.tools.book_restaurant import book_restaurant
-from app.tools.book_restaurant_vote import book_restaurant_vote, get_restaurant_vote_results, execute_restaurant_booking_with_votes
-from app.tools.book_cab import book_cab
-from app.tools.book_flight import book_flight
-from app.tools.start_vote import initiate_vote, count_vote_result
-from app.tools.image_generator import generate_image
-
+from app.cache import response_cache
 from app.config import config
+from app.memory import conversation_store
+from app.metrics import turns
+from app.model_routing import choose_route, record_turn
+from app.profiler import profile_turn
+from app.responses import EXCLUDED_TOOLS, format_tool_response, missing_params, parse_tool_content
+from app.router import route_message
+from app.startup import mark_startup, record_startup
+from app.tracing import end_span, run_in_context, span, start_span
+from app.tool_selection import TOOL_GROUP_OF, TOOL_GROUPS, is_weak_match, match_tool_groups, next_session_groups, record_selection, select_tool_groups, tool_schema_tokens
 from app.utils import send_user_message
 
 openai_api_key = config.OPENAI_API_KEY
 
-tools = [download_video, transcribe, book_hotel, book_restaurant, book_restaurant_vote, get_restaurant_vote_results, execute_restaurant_booking_with_votes, book_cab, book_flight, initiate_vote, count_vote_result, generate_image]
+# Tool name -> module defining it, in the order the tools are given to the model.
+TOOL_MODULES = {
+    "download_video": "app.tools.video_downloader",
+    "transcribe": "app.tools.transcript",
+    "book_hotel": "app.tools.book_hotel",
+    "book_restaurant": "app.tools.book_restaurant",
+    "book_restaurant_vote": "app.tools.book_restaurant_vote",
+    "get_restaurant_vote_results": "app.tools.book_restaurant_vote",
+    "execute_restaurant_booking_with_votes": "app.tools.book_restaurant_vote",
+    "book_cab": "app.tools.book_cab",
+    "book_flight": "app.tools.book_flight",
+    "initiate_vote": "app.tools.start_vote",
+    "count_vote_result": "app.tools.start_vote",
+    "generate_image": "app.tools.image_generator",
+}
 
 prompt = """
 You are a helpful assistant. STRICTLY follow these rules:
@@ -35,169 +55,457 @@ You are a helpful assistant. STRICTLY follow these rules:
    - Respond in the user's language
    - Don't assume missing arguments
    - Ask for clarification when needed
+   - When one message asks for several things (e.g. a flight and a hotel), call all the needed tools in the same step
 
 Example:
 User: "Start a vote in group Arz7KwQDd9m about 'which fruit is your favourite' with options apple, banana"
 Correct: group_id="Arz7KwQDd9m" title="which fruit is your favourite", options=["apple", "banana"]
 """
 
-agent = create_react_agent(
-    model=config.LLM_MODEL,
-    tools=tools,
-    debug=False,
-    prompt=prompt
-)
+# Tools by name, loaded on first use; for selecting tool subsets and re-running a tool call on request.
+_tools_by_name = None
+_tools_lock = threading.Lock()
 
-history = [{"role": "system", "content": prompt}]
 
-# Receives a user prompt and forwards it to the AI agent for processing.
-# Handles collecting tool call arguments and constructing responses based on tool usage.
-def invoke(prompt, from_uid):
+# Imports the tool modules and returns the tools by name.
+def get_tools_by_name():
+    global _tools_by_name
+    if _tools_by_name is None:
+        with _tools_lock:
+            if _tools_by_name is None:
+                started = time.perf_counter()
+                _tools_by_name = {
+                    name: getattr(importlib.import_module(module), name)
+                    for name, module in TOOL_MODULES.items()
+                }
+                record_startup("tools_load_seconds", time.perf_counter() - started)
+    return _tools_by_name
+
+
+# All tools, in model order.
+def get_tools():
+    return list(get_tools_by_name().values())
+
+
+# Chat models by name, created on first use and shared by all agent variants.
+_chat_models = {}
+
+
+def _chat_model(name):
+    from langchain.chat_models import init_chat_model
+
+    if name not in _chat_models:
+        _chat_models[name] = init_chat_model(name)
+    return _chat_models[name]
+
+
+# The fast model of the hedged route. Its requests time out at the hedge deadline and are not
+# retried: by then the call has escalated, and a late reply would only hold a fast-model thread.
+def _fast_chat_model():
+    from langchain.chat_models import init_chat_model
+
+    key = ("fast", config.FAST_LLM_MODEL)
+    if key not in _chat_models:
+        _chat_models[key] = init_chat_model(
+            config.FAST_LLM_MODEL, timeout=config.FAST_MODEL_DEADLINE_SECONDS, max_retries=0)
+    return _chat_models[key]
+
+
+# Builds a ReAct agent bound to the given tools.
+# The "fast" route answers with FAST_LLM_MODEL, escalating each model call to LLM_MODEL when it is late or unusable.
+def _build_agent(agent_tools, route="strong"):
+    from langgraph.prebuilt import create_react_agent
+
+    model = _chat_model(config.LLM_MODEL)
+    if route == "fast":
+        from app.hedged_model import HedgedChatModel
+
+        model = HedgedChatModel(
+            fast=_fast_chat_model(),
+            strong=_chat_model(config.LLM_MODEL),
+            deadline_seconds=config.FAST_MODEL_DEADLINE_SECONDS,
+        )
+    return create_react_agent(
+        model=model,
+        tools=agent_tools,
+        debug=False,
+        prompt=prompt
+    )
+
+
+# Agents per (route, frozenset of tool names), built on first use; least recently used first.
+_agent_variants = OrderedDict()
+_agent_variants_lock = threading.Lock()
+# Estimated schema tokens per tool name, computed on first use.
+_tool_tokens = {}
+
+
+# Returns the agent for a route bound to exactly these tools, building and caching it on first use.
+def get_agent(tool_names, route="strong"):
+    key = (route, frozenset(tool_names))
+    with _agent_variants_lock:
+        variant = _agent_variants.get(key)
+        if variant is None:
+            started = time.perf_counter()
+            variant = _build_agent([t for name, t in get_tools_by_name().items() if name in key[1]], route)
+            if not _agent_variants:
+                record_startup("first_agent_build_seconds", time.perf_counter() - started)
+            _agent_variants[key] = variant
+            while len(_agent_variants) > config.AGENT_VARIANT_CACHE_SIZE:
+                _agent_variants.popitem(last=False)
+        _agent_variants.move_to_end(key)
+        return variant
+
+
+# Estimated prompt tokens of the named tools' schemas.
+def _schema_tokens(tool_names):
+    total = 0
+    for name in tool_names:
+        if name not in _tool_tokens:
+            _tool_tokens[name] = tool_schema_tokens(get_tools_by_name()[name])
+        total += _tool_tokens[name]
+    return total
+
+
+# Chooses the agent for a turn: the tool groups the message mentions plus those the session used recently,
+# on the model route the message's complexity calls for.
+# Returns the agent and its route, with the message's matched groups and the session's groups for _remember_tool_groups.
+def _select_agent(prompt, from_uid):
+    session_groups = conversation_store.get_state(from_uid).get("tool_groups", {})
+    matched = match_tool_groups(prompt)
+    groups, fallback = select_tool_groups(matched, session_groups, is_weak_match(prompt))
+    names = [name for group in groups for name in TOOL_GROUPS[group][0]]
+    record_selection(_schema_tokens(names), _schema_tokens(TOOL_MODULES), fallback)
+    route, _ = choose_route(prompt, matched, session_groups)
+    return get_agent(names, route), route, matched, session_groups
+
+
+# Remembers the tool groups this turn mentioned or used, so follow-up turns keep them bound.
+def _remember_tool_groups(from_uid, session_groups, matched, result):
+    used = {
+        TOOL_GROUP_OF[call.get("name")]
+        for step in _turn_steps(result.get("messages", []))
+        for call in getattr(step, "tool_calls", None) or []
+        if call.get("name") in TOOL_GROUP_OF
+    }
+    conversation_store.update_state(from_uid, tool_groups=next_session_groups(session_groups, matched | used))
+
+# Identifies the model, prompt and toolset; part of every response cache key.
+PROMPT_VERSION = hashlib.sha256(
+    "\x1f".join([config.LLM_MODEL, config.FAST_LLM_MODEL, prompt] + list(TOOL_MODULES)).encode("utf-8")
+).hexdigest()[:16]
+
+# Bounded pool running synchronous agent turns for /chat and the message poller.
+agent_executor = ThreadPoolExecutor(max_workers=config.AGENT_WORKERS, thread_name_prefix="agent")
+
+
+# Loads the tools and builds the full-toolset agent ahead of the first turn.
+# Failures (e.g. a missing API key) are reported and left for the first turn to raise.
+def prewarm_agent():
+    try:
+        get_agent(TOOL_MODULES)
+        if config.MODEL_ROUTING_ENABLED:
+            get_agent(TOOL_MODULES, "fast")
+        mark_startup("agent_ready_seconds")
+    except Exception as e:
+        print(f"Agent prewarm failed: {e}")
+
+# Formats the user message and combines it with this session's recent history.
+# The system prompt is added by the agent itself, so it is not stored per session.
+def _start_turn(prompt, from_uid):
     print(f"Received prompt: {prompt} from {from_uid}")
 
-    # Format the user message and append it to the interaction history
     message = {
         "role": "user",
         "content": f"{prompt}",
     }
-    history.append(message)
 
     query = {
-        "messages": history
+        "messages": conversation_store.get(from_uid) + [message]
     }
+    return message, query
 
-    # Invoke the AI agent with the accumulated history
-    result = agent.invoke(query)
-
-    # Initialize variables for tracking tool usage and arguments
-    tool_name = None
-    collected_args = {}
-    required_params = []
-    tool_result = None
-
-    # Inspect agent's returned steps for tool calls and extract arguments
-    for step in result.get("messages", []):
-        if hasattr(step, "tool_calls"):
-            for call in step.tool_calls:
-                tool_name = call.get("name")
-                collected_args.update(call.get("args", {}))
-                # You can define required_params based on the tool manually if needed
-                if tool_name == "book_hotel":
-                    required_params = ["location", "check_in", "check_out", "guests", "room_type"]
-                if tool_name == "book_restaurant":
-                    required_params = ["location", "date", "time", "guests", "cuisine"]
-                if tool_name == "book_restaurant_vote":
-                    required_params = ["group_id"]
-                if tool_name == "get_restaurant_vote_results":
-                    required_params = ["group_id"]
-                if tool_name == "execute_restaurant_booking_with_votes":
-                    required_params = ["group_id", "location", "date", "time", "guests", "cuisine"]
-                if tool_name == "book_cab":
-                    required_params = ["pickup_location", "destination"]
-                if tool_name == "book_flight":
-                    required_params = ["origin", "destination", "departure_date"]
-                if tool_name == "initiate_vote":
-                    required_params = ["group_id", "title", "options"]
-
-        elif hasattr(step, "name") and step.name == "book_hotel":
-            try:
-                parsed = eval(step.content)
-                if isinstance(parsed, dict):
-                    collected_args.update(parsed)
-            except Exception:
-                pass
-
-    # Construct structured response
-    # Skip structured response if tool is in excluded list (e.g., image generation, counting)
-    excluded_tools = {"count_vote_result", "generate_image"}
-    if tool_name and tool_name not in excluded_tools:
-        missing_params = [p for p in required_params if
-                          p not in collected_args or not collected_args[p] or collected_args[p] == "undefined"]
-        if missing_params:
-            result["response"] = f"Got partial info for `{tool_name}`. Please provide: {', '.join(missing_params)}"
-        else:
-            # Actually call the tool and get the result
-            try:
-                if tool_name == "book_hotel":
-                    print(f"DEBUG: Calling book_hotel with parameters: {collected_args}")
-                    tool_result = book_hotel.invoke(collected_args)
-                    result["response"] = f"✅ Hotel booking confirmed!\n\n🏨 Hotel: {tool_result['hotel']}\n📍 Location: {tool_result['location']}\n📅 Check-in: {tool_result['check_in']}\n📅 Check-out: {tool_result['check_out']}\n👥 Guests: {tool_result['guests']}\n🛏️ Room Type: {tool_result['room_type']}\n🌙 Nights: {tool_result['nights']}\n💰 Total Price: ${tool_result['total_price']}\n🆔 Confirmation ID: {tool_result['confirmation_id']}"
-                elif tool_name == "book_restaurant":
-                    print(f"DEBUG: Calling book_restaurant with parameters: {collected_args}")
-                    tool_result = book_restaurant.invoke(collected_args)
-                    result["response"] = f"✅ Restaurant reservation confirmed!\n\n🍽️ Restaurant: {tool_result['restaurant']}\n📍 Location: {tool_result['location']}\n📅 Date: {tool_result['date']}\n🕐 Time: {tool_result['time']}\n👥 Guests: {tool_result['guests']}\n🍴 Cuisine: {tool_result['cuisine']}\n💰 Estimated Total: ${tool_result['total_estimated_price']}\n🆔 Reservation ID: {tool_result['reservation_id']}"
-                elif tool_name == "book_restaurant_vote":
-                    print(f"DEBUG: Calling book_restaurant_vote with parameters: {collected_args}")
-                    tool_result = book_restaurant_vote.invoke(collected_args)
-                    
-                    if tool_result.get("status") == "votes_created":
-                        created_votes = tool_result.get("created_votes", [])
-                        vote_count = len(created_votes)
-                        result["response"] = f"✅ Created {vote_count} restaurant booking votes in group {tool_result['group_id']}!\n\n📊 Votes created for: {', '.join(created_votes)}\n🗳️ Group members can now vote on each category separately.\n\nOnce all votes are complete, you can check the results and make the final booking."
-                    elif tool_result.get("status") == "no_votes_needed":
-                        result["response"] = f"✅ All restaurant booking parameters are already provided for group {tool_result['group_id']}!\n\nYou can proceed directly to booking with the provided parameters."
-                    else:
-                        result["response"] = f"✅ Restaurant booking vote created!\n\n🍽️ Group: {tool_result['group_id']}\n📊 Status: Gathering preferences\n\nThe group will vote on the missing preferences, then you can use the final booking once all votes are collected."
-                elif tool_name == "get_restaurant_vote_results":
-                    print(f"DEBUG: Calling get_restaurant_vote_results with parameters: {collected_args}")
-                    tool_result = get_restaurant_vote_results.invoke(collected_args)
-                    
-                    if tool_result.get("status") == "no_votes_found":
-                        result["response"] = f"📊 **Restaurant Vote Results**\n\n{tool_result.get('message', 'No votes found')}"
-                    else:
-                        # Format the vote results
-                        results_text = "📊 **Restaurant Vote Results**\n\n"
-                        for option, votes in tool_result.get('results', {}).items():
-                            results_text += f"• {option}: {votes} votes\n"
-                        
-                        results_text += f"\n🏆 **Winning Options:**\n"
-                        winning_options = tool_result.get('winning_options', {})
-                        for param, value in winning_options.items():
-                            results_text += f"• {param.title()}: {value}\n"
-                        
-                        result["response"] = results_text
-                elif tool_name == "execute_restaurant_booking_with_votes":
-                    print(f"DEBUG: Calling execute_restaurant_booking_with_votes with parameters: {collected_args}")
-                    tool_result = execute_restaurant_booking_with_votes.invoke(collected_args)
-                    
-                    if tool_result.get("status") == "booking_confirmed":
-                        booking_details = tool_result.get("booking_details", {})
-                        result["response"] = f"✅ Restaurant booking confirmed based on group votes!\n\n🍽️ Restaurant: {booking_details['restaurant']}\n📍 Location: {booking_details['location']}\n📅 Date: {booking_details['date']}\n🕐 Time: {booking_details['time']}\n👥 Guests: {booking_details['guests']}\n🍴 Cuisine: {booking_details['cuisine']}\n💰 Estimated Total: ${booking_details['total_estimated_price']}\n🆔 Reservation ID: {booking_details['reservation_id']}\n\n🎉 Booking completed based on group votes!"
-                    else:
-                        result["response"] = f"✅ Restaurant booking executed for group {tool_result.get('group_id', 'unknown')}"
-                elif tool_name == "book_flight":
-                    print(f"DEBUG: Calling book_flight with parameters: {collected_args}")
-                    tool_result = book_flight.invoke(collected_args)
-                    
-                    flight_details = tool_result.get('flight_details', {})
-                    pricing = tool_result.get('pricing', {})
-                    
-                    result["response"] = f"✅ Flight booking confirmed!\n\n✈️ Airline: {tool_result['airline']} ({tool_result['airline_code']})\n🛫 Origin: {tool_result['origin']}\n🛬 Destination: {tool_result['destination']}\n📅 Departure: {tool_result['departure_date']} at {flight_details.get('departure_time', 'N/A')}\n👥 Passengers: {tool_result['passengers']}\n💺 Cabin Class: {tool_result['cabin_class'].title()}\n\n🛩️ Flight Details:\n• Flight Number: {flight_details.get('flight_number', 'N/A')}\n• Aircraft: {flight_details.get('aircraft', 'N/A')}\n• Duration: {flight_details.get('duration_hours', 'N/A')} hours\n• Terminal: {flight_details.get('terminal', 'N/A')}\n• Gate: {flight_details.get('gate', 'N/A')}\n\n💰 Pricing:\n• Base Fare: ${pricing.get('base_fare', 0):.2f}\n• Taxes: ${pricing.get('taxes', 0):.2f}\n• Total: ${pricing.get('total', 0):.2f}\n\n🆔 Confirmation ID: {tool_result['confirmation_id']}"
-                elif tool_name == "book_cab":
-                    print(f"DEBUG: Calling book_cab with parameters: {collected_args}")
-                    tool_result = book_cab.invoke(collected_args)
-                    result["response"] = f"✅ Cab booking confirmed!\n\n🚕 Company: {tool_result['company']}\n👨‍💼 Driver: {tool_result['driver_name']} (⭐ {tool_result['driver_rating']})\n🚗 Vehicle: {tool_result['vehicle_info']['model']} ({tool_result['vehicle_info']['color']}, {tool_result['vehicle_info']['year']})\n📍 Pickup: {tool_result['pickup_location']}\n🎯 Destination: {tool_result['destination']}\n📅 Date: {tool_result['date']}\n🕐 Time: {tool_result['time']}\n👥 Passengers: {tool_result['passengers']}\n🚙 Cab Type: {tool_result['cab_type'].title()}\n📏 Distance: {tool_result['distance_km']} km\n⏱️ Duration: ~{tool_result['estimated_duration_minutes']} minutes\n💰 Base Fare: ${tool_result['base_fare']}\n💳 Booking Fee: ${tool_result['booking_fee']}\n💵 Total Fare: ${tool_result['total_fare']}\n💳 Payment: {tool_result['payment_method'].title()}\n🆔 Booking ID: {tool_result['booking_id']}"
-                elif tool_name == "initiate_vote":
-                    tool_result = initiate_vote.invoke(collected_args)
-                    result["response"] = f"✅ Vote initiated successfully!\n\n📊 Title: {collected_args['title']}\n👥 Group: {collected_args['group_id']}\n🗳️ Options: {', '.join(collected_args['options'])}"
-                elif tool_name == "download_video":
-                    tool_result = download_video.invoke(collected_args)
-                    result["response"] = f"📹 Video download initiated for: {collected_args.get('video_url', 'unknown URL')}"
-                elif tool_name == "transcribe":
-                    tool_result = transcribe.invoke(collected_args)
-                    result["response"] = f"📝 Transcription completed for: {collected_args.get('video_url', 'unknown URL')}"
-                else:
-                    result["response"] = f"All parameters collected for `{tool_name}`: {collected_args}"
-            except Exception as e:
-                print(f"DEBUG: Error in {tool_name}: {str(e)}")
-                print(f"DEBUG: Parameters passed: {collected_args}")
-                result["response"] = f"❌ Error executing {tool_name}: {str(e)}"
-    else:
-        result["response"] = result.get("messages", [])[-1].content if result.get("messages") else ""
-
-    history.append({"role": "assistant", "content": result["response"]})
+
+# Saves the turn to the session history and sends the reply back to the user.
+def _finish_turn(message, result, from_uid):
+    conversation_store.append(from_uid, message, {"role": "assistant", "content": result["response"]})
 
     # Send the final response back to the user via bot message
     send_user_message(from_uid, result["response"])
 
+
+# Runs a tool directly with the given arguments.
+def _run_tool(tool_name, args):
+    tool = get_tools_by_name()[tool_name]
+    if hasattr(tool, "invoke"):
+        return tool.invoke(args)
+    return tool(**args)
+
+
+# Renders the reply for one tool call from its own arguments and result.
+# tool_result is the re-run output when tools are re-run, otherwise None and the ToolMessage is used.
+# A call is only reported as partial when its tool did not run or failed; a tool that ran has
+# filled in the arguments it defaults (e.g. book_hotel's room_type) and its result is shown.
+def _render_tool_call(call, tool_message, rerun_tools=False, tool_result=None):
+    tool_name = call.get("name")
+    args = call.get("args", {})
+    ran = rerun_tools or tool_message is not None
+    if not rerun_tools and ran:
+        if tool_message.status == "error":
+            tool_result = RuntimeError(tool_message.content)
+        else:
+            tool_result = parse_tool_content(tool_message.content)
+
+    if not ran or isinstance(tool_result, Exception):
+        missing = missing_params(tool_name, args)
+        if missing:
+            return f"Got partial info for `{tool_name}`. Please provide: {', '.join(missing)}"
+        if not ran:
+            return None
+
+    try:
+        if isinstance(tool_result, Exception):
+            raise tool_result
+        return format_tool_response(tool_name, args, tool_result)
+    except Exception as e:
+        print(f"DEBUG: Error in {tool_name}: {str(e)}")
+        print(f"DEBUG: Parameters passed: {args}")
+        return f"❌ Error executing {tool_name}: {str(e)}"
+
+
+# Re-runs tool calls concurrently, returning each call's result or the exception it raised.
+def _rerun_tool_calls(calls):
+    def run(call):
+        print(f"DEBUG: Re-running {call.get('name')} with parameters: {call.get('args', {})}")
+        try:
+            return _run_tool(call.get("name"), call.get("args", {}))
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+        return list(executor.map(run, calls))
+
+
+# Returns the messages produced during this turn, after the latest user message.
+def _turn_steps(messages):
+    from langchain_core.messages import HumanMessage
+
+    start = max((i for i, step in enumerate(messages) if isinstance(step, HumanMessage)), default=-1) + 1
+    return messages[start:]
+
+
+# True when the agent called any tool during this turn.
+def _used_tools(result):
+    return any(getattr(step, "tool_calls", None) for step in _turn_steps(result.get("messages", [])))
+
+
+# Builds result["response"] from the agent's returned messages.
+# Every tool call of the turn is reported with its own arguments, in the order the model made them.
+# Results are read from the ToolMessages the agent produced while running the tools (the
+# agent's tool node runs parallel calls from one step concurrently), so every tool runs
+# exactly once per turn. Pass rerun_tools=True to run the calls again, concurrently.
+def _build_response(result, rerun_tools=False):
+    from langchain_core.messages import ToolMessage
+
+    messages = result.get("messages", [])
+    final_reply = messages[-1].content if messages else ""
+
+    # Collect the tool calls of this turn and the results of the tools the agent ran
+    tool_calls = []
+    tool_messages = {}
+    for step in _turn_steps(messages):
+        if isinstance(step, ToolMessage):
+            tool_messages[step.tool_call_id] = step
+        for call in getattr(step, "tool_calls", None) or []:
+            # Skip structured responses for excluded tools (e.g., image generation, counting)
+            if call.get("name") not in EXCLUDED_TOOLS:
+                tool_calls.append(call)
+
+    if not tool_calls:
+        result["response"] = final_reply
+        return
+
+    tool_results = _rerun_tool_calls(tool_calls) if rerun_tools else [None] * len(tool_calls)
+
+    replies = []
+    for call, tool_result in zip(tool_calls, tool_results):
+        reply = _render_tool_call(call, tool_messages.get(call.get("id")), rerun_tools, tool_result)
+        if reply is not None:
+            replies.append(reply)
+
+    # Calls the agent never ran leave no reply of their own; the model's reply covers them
+    result["response"] = "\n\n".join(replies) if replies else final_reply
+
+
+# Answers structured commands through the fast-path router, skipping the LLM.
+# Returns the finished turn's result, or None when the message needs the agent.
+def _try_fast_path(prompt, from_uid):
+    reply = route_message(prompt)
+    if reply is None:
+        return None
+
+    turns.inc(answered_by="fast_path", outcome="ok")
+    result = {"messages": [], "response": reply, "fast_path": True}
+    _finish_turn({"role": "user", "content": f"{prompt}"}, result, from_uid)
     return result
+
+
+# Response cache key for a message and the history sent along with it.
+def _cache_key(prompt, query):
+    return response_cache.key(prompt, query["messages"][:-1], PROMPT_VERSION)
+
+
+# Returns a turn result built from the response cache, or None on a miss.
+def _try_cache(cache_key):
+    reply = response_cache.get(cache_key)
+    if reply is None:
+        return None
+    turns.inc(answered_by="cache", outcome="ok")
+    return {"messages": [], "response": reply, "cached": True}
+
+
+# Returns the callback handler that splits a turn's time into model and tool time for /metrics
+# and records model calls and tools as spans under parent_span (default: the current span).
+def _turn_timer(route, parent_span=None):
+    from app.turn_timing import TurnTimer
+
+    return TurnTimer(route, parent_span)
+
+
+# Receives a user prompt and forwards it to the AI agent for processing.
+# Set rerun_tools to execute the reported tool calls again instead of reusing their results.
+# The turn is traced as an "agent.invoke" span, and profiled when profiling is enabled.
+def invoke(prompt, from_uid, rerun_tools=False):
+    with span("agent.invoke", uid=from_uid) as record:
+        trace_id = record["trace_id"] if record else None
+        with profile_turn("agent.invoke", uid=from_uid, trace_id=trace_id):
+            return _invoke(prompt, from_uid, rerun_tools)
+
+
+def _invoke(prompt, from_uid, rerun_tools):
+    result = _try_fast_path(prompt, from_uid)
+    if result is not None:
+        return result
+
+    message, query = _start_turn(prompt, from_uid)
+
+    # Reuse the reply of an identical informational turn in the same context
+    cache_key = _cache_key(prompt, query)
+    result = _try_cache(cache_key)
+    if result is None:
+        # Invoke the AI agent, bound to this turn's tools, with the session history
+        turn_agent, route, matched, session_groups = _select_agent(prompt, from_uid)
+        timer = _turn_timer(route)
+        started = time.perf_counter()
+        try:
+            result = turn_agent.invoke(query, config={"callbacks": [timer]})
+        except Exception:
+            record_turn(route, time.perf_counter() - started, succeeded=False)
+            raise
+        finally:
+            timer.finish()
+        record_turn(route, time.perf_counter() - started, succeeded=True)
+        _build_response(result, rerun_tools=rerun_tools)
+        _remember_tool_groups(from_uid, session_groups, matched, result)
+        response_cache.put(cache_key, result["response"], time.perf_counter() - started, _used_tools(result))
+
+    _finish_turn(message, result, from_uid)
+    return result
+
+
+# Runs invoke() on the bounded agent executor so callers on the event loop never block.
+async def ainvoke(prompt, from_uid):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(agent_executor, run_in_context(invoke), prompt, from_uid)
+
+
+# Runs one agent turn through the agent's async path and yields progress events as they happen:
+#   {"event": "token", "data": "<text>"}                     - model output tokens
+#   {"event": "tool_start", "data": {"name": ..., "args": ...}} - a tool call chosen by the model
+#   {"event": "tool_end", "data": {"name": ..., "output": ...}} - a tool finished
+#   {"event": "done", "data": {"response": "<final reply>"}}  - the formatted reply, also sent to the user
+# The turn is traced as an "agent.astream" span.
+async def astream(prompt, from_uid):
+    # Spans opened inside a generator cannot be made current across yields, so the turn's span
+    # is passed down explicitly instead
+    turn_span = start_span("agent.astream", uid=from_uid)
+    error = None
+    try:
+        async for event in _astream(prompt, from_uid, turn_span):
+            yield event
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        end_span(turn_span, error)
+
+
+# Starts a streamed turn; runs on the agent executor, as picking the agent may import the tools
+# and build an agent variant. Returns the message, its query and cache key, and either the
+# finished cached result or the _select_agent selection.
+def _start_stream_turn(prompt, from_uid):
+    message, query = _start_turn(prompt, from_uid)
+    cache_key = _cache_key(prompt, query)
+    result = _try_cache(cache_key)
+    if result is not None:
+        _finish_turn(message, result, from_uid)
+        return message, query, cache_key, result, None
+    return message, query, cache_key, None, _select_agent(prompt, from_uid)
+
+
+# Builds the reply of a streamed turn, records it and sends it; runs on the agent executor,
+# as sending the reply calls the Luffa API.
+def _finish_stream_turn(message, result, from_uid, cache_key, matched, session_groups, seconds):
+    _build_response(result)
+    _remember_tool_groups(from_uid, session_groups, matched, result)
+    response_cache.put(cache_key, result["response"], seconds, _used_tools(result))
+    _finish_turn(message, result, from_uid)
+
+
+async def _astream(prompt, from_uid, turn_span):
+    from langchain_core.messages import AIMessage, ToolMessage
+
+    loop = asyncio.get_running_loop()
+    fast_result = await loop.run_in_executor(agent_executor, run_in_context(_try_fast_path, turn_span), prompt, from_uid)
+    if fast_result is not None:
+        yield {"event": "done", "data": {"response": fast_result["response"]}}
+        return
+
+    message, query, cache_key, result, selection = await loop.run_in_executor(
+        agent_executor, run_in_context(_start_stream_turn, turn_span), prompt, from_uid)
+    if result is not None:
+        yield {"event": "done", "data": {"response": result["response"]}}
+        return
+
+    turn_agent, route, matched, session_groups = selection
+    timer = _turn_timer(route, turn_span)
+    started = time.perf_counter()
+    try:
+        async for mode, chunk in turn_agent.astream(
+            query, config={"callbacks": [timer]}, stream_mode=["messages", "updates", "values"]
+        ):
+            if mode == "messages":
+                token, _ = chunk
+                if isinstance(token, AIMessage) and token.content:
+                    yield {"event": "token", "data": token.content}
+            elif mode == "updates":
+                for update in chunk.values():
+                    for step in (update or {}).get("messages", []):
+                        if isinstance(step, ToolMessage):
+                            yield {"event": "tool_end", "data": {"name": step.name, "output": step.content}}
+                        for call in getattr(step, "tool_calls", None) or []:
+                            yield {"event": "tool_start", "data": {"name": call.get("name"), "args": call.get("args", {})}}
+            elif mode == "values":
+                result = dict(chunk)
+    except Exception:
+        record_turn(route, time.perf_counter() - started, succeeded=False)
+        raise
+    finally:
+        timer.finish()
+    seconds = time.perf_counter() - started
+    record_turn(route, seconds, succeeded=True)
+
+    await loop.run_in_executor(
+        agent_executor, run_in_context(_finish_stream_turn, turn_span),
+        message, result, from_uid, cache_key, matched, session_groups, seconds)
+    yield {"event": "done", "data": {"response": result["response"]}}
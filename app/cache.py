@@ -0,0 +1,107 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import config
+
+
+# Size-bounded LRU cache whose entries expire after a fixed TTL.
+class TTLCache:
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires_at, value); ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Returns the cached value, or None when missing or expired.
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Cache of agent replies for purely informational turns.
+# Keys hash the normalized message, the tail of the session history and the model/prompt
+# version, so a reply is only reused for the same question in the same context.
+# Turns that called any tool are never stored: their replies depend on side effects or live state.
+class ResponseCache:
+    def __init__(self, max_entries=None, ttl_seconds=None):
+        self._cache = TTLCache(
+            max_entries or config.RESPONSE_CACHE_MAX_ENTRIES,
+            ttl_seconds or config.RESPONSE_CACHE_TTL_SECONDS,
+        )
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped = 0
+        self.saved_seconds = 0.0
+
+    # Lowercases, collapses whitespace and drops trailing punctuation.
+    @staticmethod
+    def normalize(text):
+        return re.sub(r"\s+", " ", str(text)).strip().lower().rstrip(".!?。！？ ")
+
+    # Builds the cache key for a message given the session history sent with it.
+    def key(self, text, history, version):
+        context = "\n".join(f"{m['role']}:{m['content']}" for m in history[-config.RESPONSE_CACHE_CONTEXT_MESSAGES:])
+        raw = "\x1f".join([version, context, self.normalize(text)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # Returns the cached reply for a key, counting the hit or miss.
+    def get(self, key):
+        if not config.RESPONSE_CACHE_ENABLED:
+            return None
+        entry = self._cache.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        reply, latency = entry
+        self.hits += 1
+        self.saved_seconds += latency
+        return reply
+
+    # Stores a reply along with the latency it took to produce, unless the turn called tools.
+    def put(self, key, reply, latency, used_tools):
+        if not config.RESPONSE_CACHE_ENABLED:
+            return
+        if used_tools:
+            self.skipped += 1
+            return
+        self._cache.put(key, (reply, latency))
+        self.stores += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "skipped_tool_turns": self.skipped,
+            "saved_seconds": self.saved_seconds,
+        }
+
+
+# Shared reply cache used by the agent.
+response_cache = ResponseCache()
@@ -6,8 +6,100 @@ load_dotenv()
 class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     DEBUG = os.getenv("DEBUG", "False") == "True"
-    LLM_MODEL = "gpt-4o"
+    LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
     LUFFA_BOT_SECRET = os.getenv("LUFFA_BOT_SECRET")
     TEXT_TO_IMAGE_SERVER = os.getenv("TEXT_TO_IMAGE_SERVER")
+    LUFFA_API_BASE = os.getenv("LUFFA_API_BASE", "https://apibot.luffa.im/robot")
+    # Default timeout in seconds for Luffa bot API calls
+    LUFFA_HTTP_TIMEOUT = float(os.getenv("LUFFA_HTTP_TIMEOUT", "10"))
+    # Connection pool sizing for the shared Luffa HTTP clients
+    LUFFA_HTTP_MAX_CONNECTIONS = int(os.getenv("LUFFA_HTTP_MAX_CONNECTIONS", "20"))
+    LUFFA_HTTP_MAX_KEEPALIVE = int(os.getenv("LUFFA_HTTP_MAX_KEEPALIVE", "10"))
+    LUFFA_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LUFFA_HTTP_KEEPALIVE_EXPIRY", "30"))
+    # Group messages of one poll sent at once, across the process
+    LUFFA_FANOUT_CONCURRENCY = int(os.getenv("LUFFA_FANOUT_CONCURRENCY", "5"))
+    # How a multi-category poll is posted: "concurrent" (one message per category, sent in parallel),
+    # "serial" (one per category, in order) or "coalesced" (categories packed into as few messages
+    # as POLL_COALESCE_MAX_BUTTONS allows)
+    POLL_MESSAGE_MODE = os.getenv("POLL_MESSAGE_MODE", "concurrent")
+    POLL_COALESCE_MAX_BUTTONS = int(os.getenv("POLL_COALESCE_MAX_BUTTONS", "20"))
+    # Poll lifecycle: polls close this long after creation (0 = never), freezing their tallies and
+    # freeing their selectors; closed results are kept this long (0 = forever)
+    POLL_TTL_SECONDS = int(os.getenv("POLL_TTL_SECONDS", str(24 * 3600)))
+    POLL_CLOSED_RETENTION_SECONDS = int(os.getenv("POLL_CLOSED_RETENTION_SECONDS", str(7 * 24 * 3600)))
+    # Post the final result to the group when a poll closes
+    POLL_POST_RESULTS = os.getenv("POLL_POST_RESULTS", "False") == "True"
+    # Timer wheel driving poll expiry: seconds per tick and number of slots
+    POLL_TIMER_TICK_SECONDS = float(os.getenv("POLL_TIMER_TICK_SECONDS", "1"))
+    POLL_TIMER_SLOTS = int(os.getenv("POLL_TIMER_SLOTS", "512"))
+    # Adaptive polling: re-poll at once while batches bring new messages; when idle, wait from the
+    # min interval, growing by the backoff factor (less up to jitter x 100%) to the max interval
+    POLL_MIN_INTERVAL_SECONDS = float(os.getenv("POLL_MIN_INTERVAL_SECONDS", "0.5"))
+    POLL_MAX_INTERVAL_SECONDS = float(os.getenv("POLL_MAX_INTERVAL_SECONDS", "10"))
+    POLL_BACKOFF_FACTOR = float(os.getenv("POLL_BACKOFF_FACTOR", "2"))
+    POLL_JITTER = float(os.getenv("POLL_JITTER", "0.2"))
+    # Circuit breaker: after this many failed polls in a row, pause polling for the cooldown
+    POLL_BREAKER_FAILURES = int(os.getenv("POLL_BREAKER_FAILURES", "5"))
+    POLL_BREAKER_COOLDOWN_SECONDS = float(os.getenv("POLL_BREAKER_COOLDOWN_SECONDS", "30"))
+    # Threads available for running agent turns, shared by /chat and the poller
+    AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "8"))
+    # Maximum number of agent turns run concurrently for polled messages (one per user at a time)
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+    # Maximum number of polled messages waiting for their turn (0 = unbounded)
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "1000"))
+    # Conversation memory: sessions kept before LRU eviction, and token budget per session
+    MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "10000"))
+    MEMORY_MAX_TOKENS = int(os.getenv("MEMORY_MAX_TOKENS", "2000"))
+    # Past this many tokens a session's older turns are compacted into a summary; the last
+    # MEMORY_RECENT_MESSAGES messages stay verbatim
+    MEMORY_SUMMARY_ENABLED = os.getenv("MEMORY_SUMMARY_ENABLED", "True") == "True"
+    MEMORY_SUMMARY_THRESHOLD_TOKENS = int(os.getenv("MEMORY_SUMMARY_THRESHOLD_TOKENS", "1200"))
+    MEMORY_RECENT_MESSAGES = int(os.getenv("MEMORY_RECENT_MESSAGES", "6"))
+    # Message log backend: "memory" (ring buffer) or "sqlite" (durable, WAL mode)
+    MESSAGE_LOG_BACKEND = os.getenv("MESSAGE_LOG_BACKEND", "memory")
+    MESSAGE_LOG_PATH = os.getenv("MESSAGE_LOG_PATH", "luffabot.db")
+    # Retention: messages kept at most, and for how long
+    MESSAGE_LOG_MAX_ROWS = int(os.getenv("MESSAGE_LOG_MAX_ROWS", "100000"))
+    MESSAGE_LOG_RETENTION_SECONDS = int(os.getenv("MESSAGE_LOG_RETENTION_SECONDS", str(7 * 24 * 3600)))
+    # Messages written per transaction when the log is flushed, and seconds between compactions
+    MESSAGE_LOG_BATCH_SIZE = int(os.getenv("MESSAGE_LOG_BATCH_SIZE", "100"))
+    MESSAGE_LOG_COMPACT_INTERVAL = int(os.getenv("MESSAGE_LOG_COMPACT_INTERVAL", "300"))
+    # msgId deduplication: how long an ID is remembered, and how many IDs at most
+    DEDUP_WINDOW_SECONDS = int(os.getenv("DEDUP_WINDOW_SECONDS", "3600"))
+    DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "100000"))
+    # Fast-path router: answer structured commands without calling the LLM
+    FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "True") == "True"
+    FAST_PATH_COMMANDS = [c.strip() for c in os.getenv("FAST_PATH_COMMANDS", "count_votes,restaurant_results,selector").split(",") if c.strip()]
+    # Reply cache for informational (tool-free) turns
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "True") == "True"
+    RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "600"))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+    # Most recent history messages that are part of the cache key
+    RESPONSE_CACHE_CONTEXT_MESSAGES = int(os.getenv("RESPONSE_CACHE_CONTEXT_MESSAGES", "2"))
+    # Bind only the tools relevant to each turn, and for how many turns a used tool group stays bound
+    TOOL_SELECTION_ENABLED = os.getenv("TOOL_SELECTION_ENABLED", "True") == "True"
+    TOOL_SELECTION_MEMORY_TURNS = int(os.getenv("TOOL_SELECTION_MEMORY_TURNS", "3"))
+    # Build the agent in the background at startup instead of on the first turn
+    AGENT_PREWARM = os.getenv("AGENT_PREWARM", "True") == "True"
+    # Agent variants (one per distinct tool subset) kept compiled
+    AGENT_VARIANT_CACHE_SIZE = int(os.getenv("AGENT_VARIANT_CACHE_SIZE", "32"))
+    # Route simple turns (short follow-ups, small talk) to FAST_LLM_MODEL; everything else uses LLM_MODEL
+    MODEL_ROUTING_ENABLED = os.getenv("MODEL_ROUTING_ENABLED", "True") == "True"
+    FAST_LLM_MODEL = os.getenv("FAST_LLM_MODEL", "gpt-4o-mini")
+    # Messages longer than this always go to LLM_MODEL
+    FAST_ROUTE_MAX_CHARS = int(os.getenv("FAST_ROUTE_MAX_CHARS", "80"))
+    # Seconds the fast model has to return a usable reply before the call escalates to LLM_MODEL
+    FAST_MODEL_DEADLINE_SECONDS = float(os.getenv("FAST_MODEL_DEADLINE_SECONDS", "4"))
+    # Threads for synchronous fast-model calls; a call finding them all busy escalates at once
+    FAST_MODEL_WORKERS = int(os.getenv("FAST_MODEL_WORKERS", str(4 * AGENT_WORKERS)))
+    # Span tracing: on/off and how many finished spans are kept for /traces
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "True") == "True"
+    TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "10000"))
+    # Sampling profiler: profile agent turns slower than this many seconds (0 = off)
+    PROFILE_SLOW_TURN_SECONDS = float(os.getenv("PROFILE_SLOW_TURN_SECONDS", "0"))
+    PROFILE_SAMPLE_INTERVAL_SECONDS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_SECONDS", "0.005"))
+    # Slow-turn profiles kept for /profiles, and a directory to also write them to (empty = none)
+    PROFILE_MAX_PROFILES = int(os.getenv("PROFILE_MAX_PROFILES", "20"))
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "")
 
 config = Config()
\ No newline at end of file
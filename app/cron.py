@@ -1,50 +1,205 @@
 import asyncio
 import json
+import time
+
+from app.agent import ainvoke
+from app.config import config
+from app.dedup import message_deduplicator
+from app.dispatch import UserDispatcher
+from app.metrics import (
+    poll_batch_size, poll_circuit_open, poll_errors, poll_interval_seconds, poll_seconds, queue_depth, turns_in_flight,
+)
+from app.poll_scheduler import BREAKER_OPEN, PollScheduler
+from app.store import flush_store, message_queue, record_vote
+from app.tracing import span
+from app.utils import receive_user_message_async
+
+# Counters describing the poller. Turn-level numbers (queue depth, lag, in-flight
+# turns) come from the dispatcher while the pipeline is running.
+ingest_stats = {
+    "polls": 0,
+    "poll_errors": 0,
+    "last_batch_size": 0,
+    "enqueued": 0,
+    # Wall-clock time of the last poll the Luffa API answered
+    "last_success_at": None,
+}
+
+# The dispatcher running agent turns, and the scheduler pacing polls, while the pipeline is running.
+_dispatcher = None
+_scheduler = None
+
+# Queue gauges are read from the running dispatcher at scrape time.
+queue_depth.set_function(lambda: _dispatcher.depth if _dispatcher is not None else 0)
+turns_in_flight.set_function(lambda: _dispatcher.in_flight if _dispatcher is not None else 0)
+poll_interval_seconds.set_function(lambda: _scheduler.current_interval if _scheduler is not None else 0.0)
+poll_circuit_open.set_function(lambda: int(_scheduler is not None and _scheduler.state == BREAKER_OPEN))
+
+
+# Returns constant-size liveness figures for /health: queue depth, poller lag and the last successful poll.
+def get_ingest_liveness():
+    last_success_at = ingest_stats["last_success_at"]
+    dispatcher = _dispatcher
+    scheduler = _scheduler
+    return {
+        "polling": dispatcher is not None,
+        "poll_interval_seconds": scheduler.current_interval if scheduler is not None else None,
+        "poll_circuit": scheduler.state if scheduler is not None else None,
+        "queue_depth": dispatcher.depth if dispatcher is not None else 0,
+        "in_flight": dispatcher.in_flight if dispatcher is not None else 0,
+        "poller_lag_seconds": dispatcher.last_lag_seconds if dispatcher is not None else 0.0,
+        "last_successful_poll_at": last_success_at,
+        "seconds_since_last_successful_poll": time.time() - last_success_at if last_success_at else None,
+    }
+
+
+# Returns a snapshot of the poller counters merged with the dispatcher's.
+def get_ingest_stats():
+    stats = dict(ingest_stats)
+    if _dispatcher is not None:
+        stats.update(_dispatcher.stats())
+    if _scheduler is not None:
+        stats["scheduler"] = _scheduler.stats()
+    stats["workers"] = config.INGEST_WORKERS
+    stats["duplicates_suppressed"] = message_deduplicator.suppressed
+    return stats
+
+
+# Polls the Luffa bot for new messages and hands agent work to the dispatcher.
+# Uses the pooled async client so the event loop stays responsive while waiting on the API.
+# The scheduler sets the wait between polls: none while messages keep coming, backing off when
+# idle or failing. Each poll and each wait is traced as a span; turns dispatched from a poll
+# are traced under its span.
+async def poll_user_messages(dispatcher, scheduler):
+    while True:
+        scheduler.begin_poll()
+        with span("poll"):
+            try:
+                new_messages = await _poll_once(dispatcher)
+            except Exception as e:
+                # A malformed batch counts as a failed poll; it must not stop the poller
+                ingest_stats["poll_errors"] += 1
+                poll_errors.inc()
+                print(f"Failed to process messages: {e}")
+                new_messages = None
+
+        if new_messages is None:
+            delay = scheduler.record_failure()
+            if scheduler.state == BREAKER_OPEN:
+                print(f"Luffa receive failed {scheduler.consecutive_failures} times in a row; pausing polls for {delay:g}s")
+        else:
+            delay = scheduler.record_success(new_messages)
+
+        if delay > 0:
+            with span("poll.sleep", seconds=delay):
+                await asyncio.sleep(delay)
+
+
+# Receives one batch of messages, logs them and dispatches them.
+# Returns the number of new messages, or None when the Luffa API call failed, returned an
+# error status or answered with something other than a list of chats.
+async def _poll_once(dispatcher):
+    started = time.perf_counter()
+    response = None
+    try:
+        # Call the Luffa bot API to receive a batch of messages
+        response = await receive_user_message_async()
+        if not isinstance(response, list):
+            raise ValueError(f"unexpected receive response: {str(response)[:200]}")
+        ingest_stats["last_success_at"] = time.time()
+    except Exception as e:
+        response = None
+        ingest_stats["poll_errors"] += 1
+        poll_errors.inc()
+        print(f"Failed to receive messages: {e}")
+
+    poll_seconds.observe(time.perf_counter() - started)
+    ingest_stats["polls"] += 1
+    if response is None:
+        return None
+    batch_size = 0
+
+    # Iterate over each message group in the response
+    for item in response:
+        types = item.get("type") # 0: user 1: group
+        uid = item.get("uid")
+        count = item.get("count")
+
+        # Extract the list of messages from this group
+        messages = item.get("message", [])
+        for text in messages:
+            try:
+                # Parse each individual message as JSON
+                # message body structure
+                # {"uid":"","aiIsHidden":false,"msgId":"","text":"","languageCode":"","isHidden":false}
+                message_body = json.loads(text)
+            except json.JSONDecodeError:
+                print(f"Failed to decode message: {text}")
+                continue
+
+            from_uid = message_body.get("uid", "")
+            message_text = message_body.get("text", "")
+            if not message_text:
+                continue
+
+            # Drop redelivered messages before they are stored, counted or sent to the agent
+            msg_id = message_body.get("msgId")
+            if message_deduplicator.is_duplicate(msg_id):
+                continue
+            batch_size += 1
+
+            # Store the parsed message in the message log
+            message_queue.append({
+                "from_uid": from_uid,
+                "group_id": uid if types == 1 else None,
+                "msg_id": msg_id,
+                "message_text": message_text,
+                "ts": time.time(),
+            })
+
+            # Count votes at ingest time; dispatch other messages to the AI agent,
+            # waiting when the dispatcher is full
+            if message_text.startswith("vote:"):
+                record_vote(message_text)
+            else:
+                await dispatcher.submit(from_uid, message_text)
+                ingest_stats["enqueued"] += 1
+
+    ingest_stats["last_batch_size"] = batch_size
+    poll_batch_size.observe(batch_size)
+
+    # Write the batch and any changed vote tallies to the message log in one go
+    if batch_size:
+        try:
+            await asyncio.to_thread(flush_store)
+        except Exception as e:
+            print(f"Failed to flush message log: {e}")
+
+    return batch_size
+
+
+# Runs one agent turn on the agent executor so it never blocks the event loop.
+async def handle_user_message(message_text, from_uid):
+    with span("ingest.turn", uid=from_uid):
+        await ainvoke(message_text, from_uid)
 
-from app.agent import invoke
-from app.store import message_queue
-from app.utils import receive_user_message
 
  # Background task to continuously poll for user messages.
 async def cron_receive_user_message():
     # Continuously polls the Luffa bot for new user messages.
-    # Stores messages in the in-memory queue and forwards non-vote messages to the AI agent for processing.
-    while True:
-        # Call the Luffa bot API to receive a batch of messages
-        response = receive_user_message()
-
-        # Iterate over each message group in the response
-        for item in response:
-            types = item.get("type") # 0: user 1: group
-            uid = item.get("uid")
-            count = item.get("count")
-
-            # Extract the list of messages from this group
-            messages = item.get("message", [])
-            for text in messages:
-                try:
-                    # Parse each individual message as JSON
-                    # message body structure
-                    # {"uid":"","aiIsHidden":false,"msgId":"","text":"","languageCode":"","isHidden":false}
-                    message_body = json.loads(text)
-
-                    from_uid = message_body.get("uid", "")
-                    message_text = message_body.get("text", "")
-                    if not message_text:
-                        continue
-
-                    # Store the parsed message in the in-memory queue
-                    message_queue.append({
-                        "from_uid": from_uid,
-                        "message_text": message_text
-                    })
-
-                    # Send non-vote messages to the AI agent for handling
-                    if not message_text.startswith("vote:"):
-                        invoke(message_text, from_uid)
-
-                except json.JSONDecodeError:
-                    print(f"Failed to decode message: {text}")
-
-        # Wait for 1 second before polling for new messages again
-        await asyncio.sleep(1)
\ No newline at end of file
+    # Stores messages in the message log and forwards non-vote messages to the dispatcher,
+    # which keeps each user's turns in order while running different users concurrently.
+    global _dispatcher, _scheduler
+    _scheduler = PollScheduler()
+    _dispatcher = UserDispatcher(
+        handle_user_message,
+        workers=config.INGEST_WORKERS,
+        max_pending=config.INGEST_QUEUE_SIZE,
+    )
+    _dispatcher.start()
+    try:
+        await poll_user_messages(_dispatcher, _scheduler)
+    finally:
+        await _dispatcher.stop()
+        _dispatcher = None
+        _scheduler = None
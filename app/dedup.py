@@ -0,0 +1,55 @@
+import time
+from collections import OrderedDict
+
+from app.config import config
+
+
+# Time-windowed LRU set of recently seen message IDs.
+# A msgId seen again within the window is reported as a duplicate; entries older
+# than the window, or beyond max_entries, are forgotten so memory stays bounded.
+class MessageDeduplicator:
+    def __init__(self, window_seconds=None, max_entries=None):
+        self.window_seconds = window_seconds or config.DEDUP_WINDOW_SECONDS
+        self.max_entries = max_entries or config.DEDUP_MAX_ENTRIES
+        # msg_id -> time first seen; ordered from oldest to newest
+        self._seen = OrderedDict()
+        self.checked = 0
+        self.suppressed = 0
+
+    # Returns True if msg_id was already seen within the window, otherwise remembers it.
+    # Messages without an ID are never treated as duplicates.
+    def is_duplicate(self, msg_id):
+        if not msg_id:
+            return False
+        self.checked += 1
+        now = time.monotonic()
+        self._expire(now)
+
+        if msg_id in self._seen:
+            self.suppressed += 1
+            return True
+
+        self._seen[msg_id] = now
+        if len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        return False
+
+    # Forgets IDs first seen before the window started.
+    def _expire(self, now):
+        cutoff = now - self.window_seconds
+        while self._seen:
+            msg_id, seen_at = next(iter(self._seen.items()))
+            if seen_at >= cutoff:
+                break
+            self._seen.popitem(last=False)
+
+    def stats(self):
+        return {
+            "checked": self.checked,
+            "suppressed": self.suppressed,
+            "tracked": len(self._seen),
+        }
+
+
+# Shared deduplicator applied to every polled message before it is stored or dispatched.
+message_deduplicator = MessageDeduplicator()
@@ -0,0 +1,103 @@
+import asyncio
+import contextvars
+import time
+from collections import deque
+
+
+# Dispatches agent turns with per-user ordering and cross-user concurrency.
+# Each user has its own FIFO of pending messages and at most one turn in flight,
+# so replies to one user stay in order. Users take turns through a round-robin
+# ready queue: after one message a user goes to the back of the line, so a
+# chatty user cannot starve others. `workers` bounds concurrent turns overall.
+# Each handler call runs in the context captured when its message was submitted, so
+# context variables such as the current tracing span carry over from the submitter.
+class UserDispatcher:
+    def __init__(self, handler, workers=4, max_pending=0):
+        # handler(message_text, uid) is awaited once per message
+        self.handler = handler
+        self.workers = max(1, workers)
+        # uid -> deque of (message_text, enqueued_at, context)
+        self._pending = {}
+        # uids that have pending messages and no turn in flight, in round-robin order
+        self._ready = asyncio.Queue()
+        # uids currently waiting in _ready or running a turn
+        self._scheduled = set()
+        # Bounds the total number of pending messages; submit() waits when it is full
+        self._capacity = asyncio.Semaphore(max_pending) if max_pending > 0 else None
+        self._tasks = []
+
+        self.depth = 0
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # Queues a message for a user, waiting while the dispatcher is at capacity.
+    async def submit(self, uid, message_text):
+        if self._capacity is not None:
+            await self._capacity.acquire()
+        self._pending.setdefault(uid, deque()).append((message_text, time.monotonic(), contextvars.copy_context()))
+        self.depth += 1
+        if uid not in self._scheduled:
+            self._scheduled.add(uid)
+            self._ready.put_nowait(uid)
+
+    async def _worker(self):
+        while True:
+            uid = await self._ready.get()
+            message_text, enqueued_at, context = self._pending[uid].popleft()
+            self.depth -= 1
+            if self._capacity is not None:
+                self._capacity.release()
+
+            # Time the message spent waiting for its turn
+            lag = time.monotonic() - enqueued_at
+            self.last_lag_seconds = lag
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+
+            self.in_flight += 1
+            try:
+                # Tasks copy the context they are created in
+                await context.run(asyncio.ensure_future, self.handler(message_text, uid))
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                print(f"Failed to handle message from {uid}: {e}")
+            finally:
+                self.in_flight -= 1
+                # Requeue the user behind everyone else if more messages are waiting
+                if self._pending.get(uid):
+                    self._ready.put_nowait(uid)
+                else:
+                    self._pending.pop(uid, None)
+                    self._scheduled.discard(uid)
+
+    # Number of messages waiting for a user, not counting a turn in flight.
+    def user_queue_length(self, uid):
+        return len(self._pending.get(uid, ()))
+
+    # Returns dispatcher counters and the longest per-user queues.
+    def stats(self, top=10):
+        longest = sorted(self._pending.items(), key=lambda item: len(item[1]), reverse=True)[:top]
+        return {
+            "queue_depth": self.depth,
+            "active_users": len(self._scheduled),
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "last_lag_seconds": self.last_lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+            "user_queue_lengths": {uid: len(messages) for uid, messages in longest if messages},
+        }
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from app.config import config
+from app.model_routing import record_fast_call
+
+# Runs synchronous fast-model calls so the caller can stop waiting at the deadline.
+# A call past its deadline keeps its thread until the request times out, so calls only start while
+# a thread is free; they never queue behind stuck ones.
+_hedge_executor = ThreadPoolExecutor(max_workers=config.FAST_MODEL_WORKERS, thread_name_prefix="fast-model")
+_hedge_slots = threading.BoundedSemaphore(config.FAST_MODEL_WORKERS)
+
+
+def _call_fast(model, messages, **kwargs):
+    try:
+        return model.invoke(messages, **kwargs)
+    finally:
+        _hedge_slots.release()
+
+
+# Chat model that answers with the fast model and escalates to the strong one.
+# Each call gives the fast model deadline_seconds to return a usable reply: text, or tool calls
+# that parse and name a bound tool. Otherwise the call is re-issued to the strong model.
+# Tools only run after a model call returns, so escalating never runs a tool twice.
+# Replies are returned whole, so fast-route turns stream their reply as a single token event.
+class HedgedChatModel(BaseChatModel):
+    fast: Any
+    strong: Any
+    deadline_seconds: float
+    tool_names: frozenset = frozenset()
+
+    @property
+    def _llm_type(self):
+        return "hedged"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={
+            "fast": self.fast.bind_tools(tools, **kwargs),
+            "strong": self.strong.bind_tools(tools, **kwargs),
+            "tool_names": frozenset(convert_to_openai_tool(t)["function"]["name"] for t in tools),
+        })
+
+    # Returns why a fast-model reply cannot be used, or None when it can.
+    def _escalation(self, message):
+        if not isinstance(message, AIMessage):
+            return "empty"
+        if message.invalid_tool_calls:
+            return "invalid_tool_call"
+        if any(call.get("name") not in self.tool_names for call in message.tool_calls):
+            return "unknown_tool"
+        if not message.tool_calls and not message.content:
+            return "empty"
+        return None
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        # Every fast-model thread is busy: escalate now instead of waiting out the deadline in the queue
+        if not _hedge_slots.acquire(blocking=False):
+            record_fast_call("queued")
+            message = self.strong.invoke(messages, stop=stop, **kwargs)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        future = _hedge_executor.submit(_call_fast, self.fast, messages, stop=stop, **kwargs)
+        try:
+            message = future.result(timeout=self.deadline_seconds)
+            escalation = self._escalation(message)
+        except FutureTimeoutError:
+            escalation = "timeout"
+        except Exception as e:
+            print(f"Fast model failed, escalating: {e}")
+            escalation = "error"
+        record_fast_call(escalation)
+
+        if escalation is not None:
+            message = self.strong.invoke(messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        try:
+            message = await asyncio.wait_for(self.fast.ainvoke(messages, stop=stop, **kwargs), self.deadline_seconds)
+            escalation = self._escalation(message)
+        except asyncio.TimeoutError:
+            escalation = "timeout"
+        except Exception as e:
+            print(f"Fast model failed, escalating: {e}")
+            escalation = "error"
+        record_fast_call(escalation)
+
+        if escalation is not None:
+            message = await self.strong.ainvoke(messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -1,13 +1,33 @@
+# Imported first so startup timings are measured from (nearly) process start
+from app.startup import STARTED_AT, get_startup_report, mark_startup
+
 import asyncio
+import json
+import time
 from contextlib import asynccontextmanager
-from typing import Any
+from typing import Any, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from app.agent import invoke
-from app.cron import cron_receive_user_message
-from app.store import message_queue, vote_option_map
+from app.agent import agent_executor, ainvoke, astream, prewarm_agent
+from app.cache import response_cache
+from app.config import config
+from app.cron import cron_receive_user_message, get_ingest_liveness, get_ingest_stats
+from app.dedup import message_deduplicator
+from app.memory import conversation_store
+from app.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics_registry
+from app.model_routing import get_routing_stats
+from app.poll_lifecycle import run_poll_timers
+from app.profiler import get_profile, list_profiles
+from app.router import get_router_stats
+from app.store import (
+    close_poll, flush_store, get_poll, get_poll_lifecycle_stats, message_queue, poll_count, query_polls, restore_polls,
+)
+from app.tool_selection import get_selection_stats
+from app.tracing import get_spans, to_chrome_trace
+from app.utils import open_http_clients, close_http_clients
 
 # load OPENAI_API_KEY from .env
 load_dotenv()
@@ -15,17 +35,35 @@ load_dotenv()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Start background task
+    # Open the pooled Luffa HTTP clients before the poller starts using them
+    await open_http_clients()
+    # Bring back polls and vote tallies saved by a previous run
+    restore_polls()
+
+    # Start background tasks: the poller, and the timers closing expired polls
     task = asyncio.create_task(cron_receive_user_message())
+    timers_task = asyncio.create_task(run_poll_timers())
+
+    # Build the agent off the event loop without holding up startup; /health answers meanwhile
+    if config.AGENT_PREWARM:
+        asyncio.get_running_loop().run_in_executor(agent_executor, prewarm_agent)
+
+    mark_startup("ready_seconds")
     yield
-    task.cancel()
-    try:
-        await task
-    except asyncio.CancelledError:
-        pass
+    for background_task in (task, timers_task):
+        background_task.cancel()
+        try:
+            await background_task
+        except asyncio.CancelledError:
+            pass
+
+    await close_http_clients()
+    flush_store()
+    message_queue.close()
 
 
 app = FastAPI(lifespan=lifespan)
+mark_startup("import_seconds")
 
 
 class ChatRequest(BaseModel):
@@ -43,10 +81,157 @@ async def chat(req: ChatRequest):
     if not text:
         raise HTTPException(400, "Message cannot be empty")
 
-    output = invoke(text, req.session_id)
+    # Run the turn on the agent executor so other requests keep being served meanwhile
+    output = await ainvoke(text, req.session_id)
     return ChatResponse(response=output, session_id=req.session_id)
 
 
+# Streams a chat turn as server-sent events: model tokens and tool progress as they
+# are produced, then a final "done" event carrying the formatted reply.
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    text = req.message.strip()
+    if not text:
+        raise HTTPException(400, "Message cannot be empty")
+
+    async def events():
+        try:
+            async for event in astream(text, req.session_id):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+# Liveness probe: constant-size figures only, cheap enough for every load-balancer check.
 @app.get("/health")
 async def health():
-    return {"status": "ok", "message_queue": message_queue, "vote_option_map": vote_option_map}
+    return {
+        "status": "ok",
+        "uptime_seconds": time.monotonic() - STARTED_AT,
+        **get_ingest_liveness(),
+    }
+
+
+# Component counters: startup timings, ingest, memory, caches, routing and store sizes.
+@app.get("/stats")
+async def stats():
+    return {
+        "startup": get_startup_report(),
+        "ingest": get_ingest_stats(),
+        "memory": conversation_store.stats(),
+        "dedup": message_deduplicator.stats(),
+        "router": get_router_stats(),
+        "response_cache": response_cache.stats(),
+        "tool_selection": get_selection_stats(),
+        "model_routing": get_routing_stats(),
+        "message_log": {"messages": await asyncio.to_thread(message_queue.count)},
+        "polls": {"polls": poll_count(), **get_poll_lifecycle_stats()},
+    }
+
+
+# Prometheus scrape endpoint: pipeline latency histograms, counters and gauges.
+@app.get("/metrics")
+async def metrics():
+    return Response(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+# Largest page the inspection endpoints return.
+MAX_PAGE_SIZE = 500
+
+
+def _page(items, offset, limit):
+    return {
+        "items": items,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + len(items) if len(items) == limit else None,
+    }
+
+
+# Logged messages, newest first, filtered by sender, group and time range (unix seconds, until exclusive).
+@app.get("/messages")
+async def list_messages(
+    uid: Optional[str] = None,
+    group_id: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+):
+    # The SQLite backend reads from disk, so keep the query off the event loop
+    items = await asyncio.to_thread(
+        message_queue.query, uid=uid, group_id=group_id, since=since, until=until, offset=offset, limit=limit
+    )
+    return _page(items, offset, limit)
+
+
+# Polls with their options and tallies (or frozen results once closed), newest first,
+# filtered by group, kind, status ("open" or "closed") and creation time.
+@app.get("/polls")
+async def list_polls(
+    group_id: Optional[str] = None,
+    kind: Optional[str] = None,
+    status: Optional[str] = Query(None, pattern="^(open|closed)$"),
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+):
+    items = query_polls(group_id=group_id, kind=kind, status=status, since=since, until=until, offset=offset, limit=limit)
+    return _page(items, offset, limit)
+
+
+@app.get("/polls/{poll_id}")
+async def poll_detail(poll_id: str):
+    poll = get_poll(poll_id)
+    if poll is None:
+        raise HTTPException(404, "Poll not found")
+    return poll
+
+
+# Closes an open poll before its deadline, freezing its result.
+@app.post("/polls/{poll_id}/close")
+async def close_poll_now(poll_id: str):
+    poll = get_poll(poll_id)
+    if poll is None:
+        raise HTTPException(404, "Poll not found")
+    closed = close_poll(poll["group_id"], poll_id)
+    if closed is None:
+        raise HTTPException(409, "Poll is already closed")
+    await asyncio.to_thread(flush_store)
+    return closed
+
+
+# Recent tracing spans, newest first, optionally for one trace. format=chrome returns a
+# Chrome trace file (open it in chrome://tracing or Perfetto).
+@app.get("/traces")
+async def traces(
+    trace_id: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    format: str = Query("json", pattern="^(json|chrome)$"),
+):
+    spans = get_spans(trace_id=trace_id, limit=limit)
+    if format == "chrome":
+        return Response(
+            json.dumps(to_chrome_trace(spans)),
+            media_type="application/json",
+            headers={"Content-Disposition": 'attachment; filename="luffabot-trace.json"'},
+        )
+    return {"spans": spans}
+
+
+# Profiles kept for slow agent turns (PROFILE_SLOW_TURN_SECONDS), newest first.
+@app.get("/profiles")
+async def profiles():
+    return {"profiles": list_profiles()}
+
+
+# One slow-turn profile as collapsed stacks, ready for flamegraph tools.
+@app.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def profile_detail(profile_id: str):
+    profile = get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(404, "Profile not found")
+    return profile["collapsed"]
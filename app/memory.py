@@ -0,0 +1,135 @@
+import threading
+from collections import OrderedDict
+
+from app.config import config
+from app.summary import render_summary, summarize_history
+
+
+# Rough token estimate (~4 characters per token), good enough for budgeting history.
+def estimate_tokens(text):
+    return len(str(text)) // 4 + 1
+
+
+# Per-session conversation history with LRU eviction of idle sessions.
+# Once a session passes its summary threshold, older turns are compacted into a structured
+# summary (confirmed bookings, pending slots) and only the most recent turns stay verbatim.
+# Each session also keeps only as many messages as fit in its token budget,
+# so the prompt sent to the LLM stays bounded no matter how long a chat runs.
+class ConversationStore:
+    def __init__(self, max_sessions=None, max_tokens=None, summary_threshold=None, recent_messages=None):
+        self.max_sessions = max_sessions or config.MEMORY_MAX_SESSIONS
+        self.max_tokens = max_tokens or config.MEMORY_MAX_TOKENS
+        self.summary_threshold = summary_threshold or config.MEMORY_SUMMARY_THRESHOLD_TOKENS
+        self.recent_messages = recent_messages or config.MEMORY_RECENT_MESSAGES
+        # session_id -> {"messages": [...], "tokens": int, "state": {...}, "summary": {...} or None,
+        # "summary_text": str}; ordered from least to most recently used
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted_sessions = 0
+        self.trimmed_messages = 0
+        self.compactions = 0
+        self.compacted_messages = 0
+
+    # Returns a copy of the stored messages for a session, led by the summary of compacted
+    # turns if there is one, and marks the session as recently used.
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            self._sessions.move_to_end(session_id)
+            if session["summary"] is None:
+                return list(session["messages"])
+            return [{"role": "system", "content": session["summary_text"]}] + session["messages"]
+
+    # Returns the session record, creating it if needed, and marks it as recently used.
+    # Must be called with the lock held.
+    def _session(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = {"messages": [], "tokens": 0, "state": {}, "summary": None, "summary_text": ""}
+            self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        return session
+
+    # Returns a copy of the session's state: small per-session facts kept alongside its history.
+    def get_state(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return dict(session["state"]) if session is not None else {}
+
+    # Updates keys of the session's state.
+    def update_state(self, session_id, **values):
+        with self._lock:
+            self._session(session_id)["state"].update(values)
+            self._evict()
+
+    # Appends the messages of one turn to a session, then enforces the token and session limits.
+    def append(self, session_id, *messages):
+        with self._lock:
+            session = self._session(session_id)
+
+            for message in messages:
+                session["messages"].append(message)
+                session["tokens"] += estimate_tokens(message["content"])
+
+            self._compact(session)
+            self._trim(session)
+            self._evict()
+
+    # Evicts the least recently used sessions once over the limit. Must be called with the lock held.
+    def _evict(self):
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted_sessions += 1
+
+    # Folds older turns into the session summary once the session passes the summary threshold.
+    # The most recent messages stay verbatim, starting on a user message.
+    def _compact(self, session):
+        messages = session["messages"]
+        if not config.MEMORY_SUMMARY_ENABLED or session["tokens"] <= self.summary_threshold:
+            return
+
+        cut = len(messages) - self.recent_messages
+        while 0 < cut < len(messages) and messages[cut]["role"] != "user":
+            cut += 1
+        if cut <= 0 or cut >= len(messages):
+            return
+
+        older = messages[:cut]
+        del messages[:cut]
+        session["summary"] = summarize_history(session["summary"], older)
+        session["summary_text"] = render_summary(session["summary"])
+        session["tokens"] = estimate_tokens(session["summary_text"]) + sum(estimate_tokens(m["content"]) for m in messages)
+        self.compactions += 1
+        self.compacted_messages += len(older)
+
+    # Drops the oldest messages until the session fits its token budget.
+    # The session always starts on a user message so the model never sees an orphaned reply.
+    def _trim(self, session):
+        messages = session["messages"]
+        while messages and (session["tokens"] > self.max_tokens or messages[0]["role"] != "user"):
+            dropped = messages.pop(0)
+            session["tokens"] -= estimate_tokens(dropped["content"])
+            self.trimmed_messages += 1
+
+    # Forgets a session's history.
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    # Returns size counters for monitoring.
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "tokens": sum(session["tokens"] for session in self._sessions.values()),
+                "evicted_sessions": self.evicted_sessions,
+                "trimmed_messages": self.trimmed_messages,
+                "compactions": self.compactions,
+                "compacted_messages": self.compacted_messages,
+            }
+
+
+# Shared conversation store used by the agent for every user and group.
+conversation_store = ConversationStore()
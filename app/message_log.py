@@ -0,0 +1,226 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from app.config import config
+
+# Message log backends for incoming Luffa messages.
+# Each stored message is a dict:
+# {"from_uid": "", "group_id": "", "msg_id": "", "message_text": "", "ts": 1718000000.0}
+# Both backends bound their size through a row cap and a retention window, and can
+# persist poll records so vote state survives a restart where the backend allows it.
+
+
+# In-memory ring buffer. The oldest messages drop off once max_rows is reached.
+# Nothing survives a restart; poll persistence is a no-op.
+class RingBufferMessageLog:
+    def __init__(self, max_rows=None, retention_seconds=None):
+        self.max_rows = max_rows or config.MESSAGE_LOG_MAX_ROWS
+        self.retention_seconds = retention_seconds or config.MESSAGE_LOG_RETENTION_SECONDS
+        self._messages = deque(maxlen=self.max_rows)
+        self._lock = threading.Lock()
+
+    def append(self, message):
+        with self._lock:
+            self._messages.append(message)
+
+    # Appends are applied immediately, so there is nothing to flush.
+    def flush(self):
+        pass
+
+    # Returns matching messages, newest first.
+    def query(self, uid=None, group_id=None, since=None, until=None, offset=0, limit=100):
+        with self._lock:
+            messages = list(self._messages)
+        matched = [
+            message for message in reversed(messages)
+            if (uid is None or message.get("from_uid") == uid)
+            and (group_id is None or message.get("group_id") == group_id)
+            and (since is None or message.get("ts", 0) >= since)
+            and (until is None or message.get("ts", 0) < until)
+        ]
+        return matched[offset:offset + limit]
+
+    def count(self):
+        return len(self._messages)
+
+    # Drops messages older than the retention window. Returns the number removed.
+    def compact(self):
+        cutoff = time.time() - self.retention_seconds
+        removed = 0
+        with self._lock:
+            while self._messages and self._messages[0].get("ts", 0) < cutoff:
+                self._messages.popleft()
+                removed += 1
+        return removed
+
+    def save_polls(self, poll_records):
+        pass
+
+    def delete_polls(self, poll_ids):
+        pass
+
+    def load_polls(self):
+        return []
+
+    def close(self):
+        pass
+
+
+# Embedded SQLite log in WAL mode. Appends are only buffered; flush() writes them in
+# transactions of batch_size rows, off the event loop. Queries use indexes on uid, group
+# and time, and poll records are stored alongside so vote tallies survive a restart.
+class SQLiteMessageLog:
+    def __init__(self, path=None, max_rows=None, retention_seconds=None, batch_size=None):
+        self.path = path or config.MESSAGE_LOG_PATH
+        self.max_rows = max_rows or config.MESSAGE_LOG_MAX_ROWS
+        self.retention_seconds = retention_seconds or config.MESSAGE_LOG_RETENTION_SECONDS
+        self.batch_size = batch_size or config.MESSAGE_LOG_BATCH_SIZE
+        self._pending = []
+        # Guards only the append buffer, so appends from the event loop never wait on a SQLite write;
+        # _lock serialises use of the connection
+        self._pending_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                from_uid TEXT,
+                group_id TEXT,
+                msg_id TEXT,
+                message_text TEXT,
+                ts REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_uid_ts ON messages (from_uid, ts);
+            CREATE INDEX IF NOT EXISTS idx_messages_group_ts ON messages (group_id, ts);
+            CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages (ts);
+            CREATE TABLE IF NOT EXISTS polls (
+                poll_id TEXT PRIMARY KEY,
+                group_id TEXT,
+                record TEXT
+            );
+        """)
+        self._conn.commit()
+
+    # Buffers a message without touching the database; flush() writes the buffer.
+    def append(self, message):
+        with self._pending_lock:
+            self._pending.append(message)
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    # Writes the buffered messages in transactions of batch_size rows. Messages that fail to
+    # write go back to the buffer for the next flush.
+    def _flush_locked(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        rows = [
+            (m.get("from_uid"), m.get("group_id"), m.get("msg_id"), m.get("message_text"), m.get("ts", time.time()))
+            for m in pending
+        ]
+        written = 0
+        try:
+            while written < len(rows):
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO messages (from_uid, group_id, msg_id, message_text, ts) VALUES (?, ?, ?, ?, ?)",
+                        rows[written:written + self.batch_size],
+                    )
+                written += self.batch_size
+        except Exception:
+            with self._pending_lock:
+                self._pending[:0] = pending[written:]
+            raise
+
+    # Returns matching messages, newest first. Pending appends are flushed first so reads are consistent.
+    def query(self, uid=None, group_id=None, since=None, until=None, offset=0, limit=100):
+        clauses = []
+        params = []
+        if uid is not None:
+            clauses.append("from_uid = ?")
+            params.append(uid)
+        if group_id is not None:
+            clauses.append("group_id = ?")
+            params.append(group_id)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.extend([limit, offset])
+
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(
+                f"SELECT from_uid, group_id, msg_id, message_text, ts FROM messages {where} "
+                f"ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?",
+                params,
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self):
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+            return stored + len(self._pending)
+
+    # Deletes messages older than the retention window and the oldest rows beyond max_rows.
+    # Returns the number of rows removed.
+    def compact(self):
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            self._flush_locked()
+            with self._conn:
+                removed = self._conn.execute("DELETE FROM messages WHERE ts < ?", (cutoff,)).rowcount
+                removed += self._conn.execute(
+                    "DELETE FROM messages WHERE id <= (SELECT id FROM messages ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (self.max_rows,),
+                ).rowcount
+        return removed
+
+    # Upserts poll records (see app.store.polls) so they can be restored on startup.
+    def save_polls(self, poll_records):
+        rows = [(poll["poll_id"], poll["group_id"], json.dumps(poll)) for poll in poll_records]
+        if not rows:
+            return
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO polls (poll_id, group_id, record) VALUES (?, ?, ?)",
+                    rows,
+                )
+
+    def delete_polls(self, poll_ids):
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("DELETE FROM polls WHERE poll_id = ?", [(poll_id,) for poll_id in poll_ids])
+
+    def load_polls(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT record FROM polls").fetchall()
+        return [json.loads(row["record"]) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+# Creates the message log backend selected by MESSAGE_LOG_BACKEND ("memory" or "sqlite").
+def create_message_log():
+    if config.MESSAGE_LOG_BACKEND == "sqlite":
+        return SQLiteMessageLog()
+    if config.MESSAGE_LOG_BACKEND == "memory":
+        return RingBufferMessageLog()
+    raise ValueError(f"Unknown MESSAGE_LOG_BACKEND: {config.MESSAGE_LOG_BACKEND}")
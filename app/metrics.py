@@ -0,0 +1,172 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process metrics in the Prometheus text exposition format, served by /metrics.
+# Counters, gauges and histograms are kept in memory per label set; nothing is pushed anywhere.
+
+# Latency buckets in seconds, from fast in-process work up to slow LLM turns.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Buckets for message counts per poll.
+SIZE_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        # label values tuple -> value (or histogram state)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for name, key, extra, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.label_names, key, extra)} {_format_value(value)}")
+        return lines
+
+
+# Monotonically increasing count, e.g. requests or errors.
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+# Value that goes up and down. Either set directly, or read from a function at scrape time.
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._function = None
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function):
+        self._function = function
+
+    def _samples(self):
+        if self._function is not None:
+            return [(self.name, (), (), self._function())]
+        return super()._samples()
+
+
+# Distribution of observed values in cumulative buckets, with their sum and count.
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    # Observes the duration of the with-block in seconds, whether or not it raises.
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, state in self._values.items():
+                for bound, count in zip(self.buckets, state["buckets"]):
+                    samples.append((f"{self.name}_bucket", key, (("le", _format_value(float(bound))),), count))
+                samples.append((f"{self.name}_bucket", key, (("le", "+Inf"),), state["count"]))
+                samples.append((f"{self.name}_sum", key, (), state["sum"]))
+                samples.append((f"{self.name}_count", key, (), state["count"]))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    # Renders every metric in the Prometheus text format.
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Content type of the Prometheus text exposition format.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Poller (app.cron)
+poll_seconds = Histogram("luffabot_poll_duration_seconds", "Time to receive one batch from the Luffa API.")
+poll_batch_size = Histogram("luffabot_poll_batch_size", "New messages per polled batch.", buckets=SIZE_BUCKETS)
+poll_errors = Counter("luffabot_poll_errors_total", "Polls that failed.")
+poll_interval_seconds = Gauge("luffabot_poll_interval_seconds", "Wait chosen before the next poll.")
+poll_circuit_open = Gauge("luffabot_poll_circuit_open", "1 while repeated poll failures have paused polling.")
+queue_depth = Gauge("luffabot_queue_depth", "Polled messages waiting for an agent turn.")
+turns_in_flight = Gauge("luffabot_turns_in_flight", "Agent turns running for polled messages.")
+
+# Agent turns (app.agent)
+turn_seconds = Histogram("luffabot_agent_turn_duration_seconds", "Agent turn latency by model route.", ["route"])
+turns = Counter("luffabot_agent_turns_total", "Agent turns by how they were answered and their outcome.", ["answered_by", "outcome"])
+llm_seconds = Histogram("luffabot_llm_duration_seconds", "Time spent in model calls.", ["route"])
+llm_turn_seconds = Histogram("luffabot_agent_turn_llm_seconds", "Model time per agent turn.", ["route"])
+tool_turn_seconds = Histogram("luffabot_agent_turn_tool_seconds", "Tool time per agent turn.", ["route"])
+tool_seconds = Histogram("luffabot_tool_duration_seconds", "Tool run latency by tool.", ["tool"])
+tool_errors = Counter("luffabot_tool_errors_total", "Tool runs that raised, by tool.", ["tool"])
+
+# Luffa API (app.utils)
+luffa_seconds = Histogram("luffabot_luffa_request_duration_seconds", "Luffa bot API request latency by endpoint.", ["endpoint"])
+luffa_requests = Counter("luffabot_luffa_requests_total", "Luffa bot API requests by endpoint.", ["endpoint"])
+luffa_errors = Counter("luffabot_luffa_request_errors_total", "Luffa bot API requests that failed or returned an error status.", ["endpoint"])
+
+# Votes (app.store)
+vote_seconds = Histogram("luffabot_vote_tally_duration_seconds", "Time to record a vote or tally a poll.", ["operation"])
+poll_create_seconds = Histogram("luffabot_poll_create_duration_seconds", "Time from creating a poll until its group messages are sent, by poll kind.", ["kind"])
@@ -0,0 +1,84 @@
+import re
+import threading
+
+from app.config import config
+from app.metrics import turn_seconds, turns
+
+# Complexity-based routing between a fast model and the strong model (LLM_MODEL).
+# Short follow-ups inside an ongoing task ("4 people", a date) and small talk go to the fast
+# model; new tasks, long or multi-intent messages go to the strong model. Fast-route turns are
+# hedged per model call by app.hedged_model.HedgedChatModel.
+
+ROUTES = ("fast", "strong")
+
+_DATE_OR_NUMBER = re.compile(r"\d")
+
+# Per-route turn counters, why each route was chosen, and how fast-model calls ended.
+route_stats = {route: {"turns": 0, "failed": 0, "total_seconds": 0.0, "max_seconds": 0.0} for route in ROUTES}
+route_reasons = {}
+hedge_stats = {
+    "fast_calls": 0,
+    "fast_answered": 0,
+    "escalations": {"queued": 0, "timeout": 0, "error": 0, "invalid_tool_call": 0, "unknown_tool": 0, "empty": 0},
+}
+_stats_lock = threading.Lock()
+
+
+# Picks the route for a turn from message features and session state.
+# matched_groups are the tool groups the message mentions, session_groups those the session used recently.
+# Returns (route, reason).
+def choose_route(text, matched_groups, session_groups):
+    if not config.MODEL_ROUTING_ENABLED or not config.FAST_LLM_MODEL:
+        route, reason = "strong", "disabled"
+    elif len(text) > config.FAST_ROUTE_MAX_CHARS:
+        route, reason = "strong", "long_message"
+    elif len(matched_groups) > 1:
+        route, reason = "strong", "multiple_intents"
+    elif session_groups and (not matched_groups or set(matched_groups) <= set(session_groups)):
+        # A short reply inside the task the session is already working on
+        route, reason = "fast", "slot_filling"
+    elif not matched_groups and not _DATE_OR_NUMBER.search(text):
+        route, reason = "fast", "small_talk"
+    else:
+        route, reason = "strong", "new_task"
+
+    with _stats_lock:
+        route_reasons[reason] = route_reasons.get(reason, 0) + 1
+    return route, reason
+
+
+# Records the latency and outcome of one agent turn on a route.
+def record_turn(route, seconds, succeeded):
+    with _stats_lock:
+        stats = route_stats[route]
+        stats["turns"] += 1
+        stats["failed"] += int(not succeeded)
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+    turn_seconds.observe(seconds, route=route)
+    turns.inc(answered_by="agent", outcome="ok" if succeeded else "error")
+
+
+# Records how one fast-model call ended: None when its reply was used, else why it escalated.
+def record_fast_call(escalation):
+    with _stats_lock:
+        hedge_stats["fast_calls"] += 1
+        if escalation is None:
+            hedge_stats["fast_answered"] += 1
+        else:
+            hedge_stats["escalations"][escalation] += 1
+
+
+# Returns per-route latency and success figures, the routing reasons and the hedging outcomes.
+def get_routing_stats():
+    with _stats_lock:
+        routes = {}
+        for route, stats in route_stats.items():
+            turns = stats["turns"]
+            routes[route] = dict(
+                stats,
+                avg_seconds=stats["total_seconds"] / turns if turns else 0.0,
+                success_ratio=(turns - stats["failed"]) / turns if turns else 0.0,
+            )
+        hedging = dict(hedge_stats, escalations=dict(hedge_stats["escalations"]))
+        return {"routes": routes, "reasons": dict(route_reasons), "hedging": hedging}
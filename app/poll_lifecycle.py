@@ -0,0 +1,44 @@
+import asyncio
+
+from app.config import config
+from app.store import close_poll, flush_store, option_label, poll_timers, purge_poll
+from app.utils import send_group_message_async
+
+# Poll expiry, driven by the store's timer wheel while the app is running.
+# A poll reaching its deadline is closed: its tally is frozen, its selectors are freed and, with
+# POLL_POST_RESULTS, the result is posted to the group. Closed results are purged once
+# POLL_CLOSED_RETENTION_SECONDS have passed.
+
+
+# Formats a closed poll's frozen result as a group message, marking the leading option of each category.
+def render_poll_result(poll):
+    lines = [f"🗳️ **Vote closed: {poll.get('title') or 'Poll'}**", ""]
+    for category, options in poll["result"].items():
+        top_votes = max(options.values(), default=0)
+        for option, votes in options.items():
+            marker = " 🏆" if votes and votes == top_votes else ""
+            lines.append(f"{option_label(category, option)}: {votes}{marker}")
+    return "\n".join(lines)
+
+
+async def _on_poll_timer(key):
+    action, group_id, poll_id = key
+    if action == "close":
+        closed = close_poll(group_id, poll_id)
+        if closed is None:
+            return
+        if config.POLL_POST_RESULTS:
+            try:
+                await send_group_message_async(group_id, {"text": render_poll_result(closed)})
+            except Exception as e:
+                print(f"Failed to post result of poll {poll_id}: {e}")
+        # Save the closed record right away rather than with the next message batch
+        await asyncio.to_thread(flush_store)
+    elif action == "purge":
+        # Deletes the saved record too, which touches the message log
+        await asyncio.to_thread(purge_poll, group_id, poll_id)
+
+
+# Fires poll deadlines until cancelled. Started from the FastAPI lifespan.
+async def run_poll_timers():
+    await poll_timers.run(_on_poll_timer)
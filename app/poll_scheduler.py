@@ -0,0 +1,101 @@
+import math
+import random
+import time
+
+from app.config import config
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+# Decides how long the poller waits before its next receive call.
+# While polls bring new messages it re-polls at once, draining bursts without delay. Once a poll
+# comes back empty it waits min_interval, then backs off exponentially up to max_interval, each
+# wait shortened by a random jitter; the first new message snaps it back to immediate polling.
+# Failed polls back off the same way, and after breaker_failures failures in a row the circuit
+# opens: polling pauses for breaker_cooldown, then a single trial poll closes it again or reopens it.
+class PollScheduler:
+    def __init__(self, min_interval=None, max_interval=None, backoff_factor=None, jitter=None,
+                 breaker_failures=None, breaker_cooldown=None, random_fn=random.random):
+        self.min_interval = min_interval if min_interval is not None else config.POLL_MIN_INTERVAL_SECONDS
+        self.max_interval = max(self.min_interval, max_interval if max_interval is not None else config.POLL_MAX_INTERVAL_SECONDS)
+        self.backoff_factor = backoff_factor if backoff_factor is not None else config.POLL_BACKOFF_FACTOR
+        self.jitter = jitter if jitter is not None else config.POLL_JITTER
+        self.breaker_failures = breaker_failures if breaker_failures is not None else config.POLL_BREAKER_FAILURES
+        self.breaker_cooldown = breaker_cooldown if breaker_cooldown is not None else config.POLL_BREAKER_COOLDOWN_SECONDS
+        self._random = random_fn
+        # Backoff steps after which the interval reaches max_interval; growing the exponent past it
+        # would only risk overflowing the float
+        if self.min_interval > 0 and self.backoff_factor > 1:
+            self._max_backoff_steps = math.ceil(math.log(self.max_interval / self.min_interval, self.backoff_factor))
+        else:
+            self._max_backoff_steps = 0
+
+        self.state = BREAKER_CLOSED
+        # Empty or failed polls since the last poll that brought messages
+        self._idle_polls = 0
+        self.consecutive_failures = 0
+        # Wait chosen after the last poll
+        self.current_interval = 0.0
+        self.polls = 0
+        self.busy_polls = 0
+        self.empty_polls = 0
+        self.failed_polls = 0
+        self.breaker_opens = 0
+        self.opened_at = None
+
+    # Called before each poll; the first poll after an open circuit's cooldown is its trial.
+    def begin_poll(self):
+        self.polls += 1
+        if self.state == BREAKER_OPEN:
+            self.state = BREAKER_HALF_OPEN
+
+    # Records a poll the API answered with new_messages new messages. Returns the wait before the next poll.
+    def record_success(self, new_messages):
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        if new_messages > 0:
+            self.busy_polls += 1
+            self._idle_polls = 0
+            self.current_interval = 0.0
+        else:
+            self.empty_polls += 1
+            self._idle_polls += 1
+            self.current_interval = self._backoff(self._idle_polls)
+        return self.current_interval
+
+    # Records a failed poll. Returns the wait before the next poll.
+    def record_failure(self):
+        self.failed_polls += 1
+        self.consecutive_failures += 1
+        self._idle_polls += 1
+        if self.state == BREAKER_HALF_OPEN or self.consecutive_failures >= self.breaker_failures:
+            if self.state != BREAKER_OPEN:
+                self.breaker_opens += 1
+            self.state = BREAKER_OPEN
+            self.opened_at = time.time()
+            self.current_interval = self.breaker_cooldown
+        else:
+            self.current_interval = self._backoff(self.consecutive_failures)
+        return self.current_interval
+
+    # Wait after the n-th idle or failed poll in a row: exponential from min_interval, capped, jittered down.
+    def _backoff(self, n):
+        steps = min(n - 1, self._max_backoff_steps)
+        interval = min(self.max_interval, self.min_interval * self.backoff_factor ** steps)
+        return interval * (1 - self.jitter * self._random())
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "current_interval_seconds": self.current_interval,
+            "polls": self.polls,
+            "busy_polls": self.busy_polls,
+            "empty_polls": self.empty_polls,
+            "failed_polls": self.failed_polls,
+            "consecutive_failures": self.consecutive_failures,
+            "breaker_opens": self.breaker_opens,
+            "breaker_opened_at": self.opened_at,
+        }
@@ -0,0 +1,118 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from app.config import config
+
+# Opt-in sampling profiler for slow agent turns.
+# Enabled by PROFILE_SLOW_TURN_SECONDS > 0. While a turn runs, a background thread samples
+# the turn's thread stack with sys._current_frames() every PROFILE_SAMPLE_INTERVAL_SECONDS.
+# Turns that take at least the threshold keep their profile as collapsed stacks
+# ("outer;inner;leaf count" lines, the input format of flamegraph tools); faster turns are discarded.
+# Only the turn's own thread is sampled: time in parallel tool threads shows up as waiting.
+
+# Kept profiles of slow turns, oldest first.
+slow_profiles = deque(maxlen=config.PROFILE_MAX_PROFILES)
+
+# thread ident -> Counter of collapsed stacks for turns being profiled
+_watched = {}
+_lock = threading.Lock()
+_sampler = None
+
+
+def enabled():
+    return config.PROFILE_SLOW_TURN_SECONDS > 0
+
+
+def _collapse(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def _sample_loop():
+    while True:
+        time.sleep(config.PROFILE_SAMPLE_INTERVAL_SECONDS)
+        with _lock:
+            if not _watched:
+                continue
+            watched = list(_watched.items())
+        frames = sys._current_frames()
+        for ident, stacks in watched:
+            frame = frames.get(ident)
+            if frame is not None:
+                stacks[_collapse(frame)] += 1
+
+
+def _ensure_sampler():
+    global _sampler
+    with _lock:
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="turn-profiler", daemon=True)
+            _sampler.start()
+
+
+# Samples the current thread during the with-block and keeps the profile if it ran slower
+# than PROFILE_SLOW_TURN_SECONDS. A no-op unless profiling is enabled.
+@contextmanager
+def profile_turn(name, **attributes):
+    if not enabled():
+        yield
+        return
+
+    _ensure_sampler()
+    ident = threading.get_ident()
+    stacks = Counter()
+    with _lock:
+        _watched[ident] = stacks
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _watched.pop(ident, None)
+        duration = time.perf_counter() - started
+        if duration >= config.PROFILE_SLOW_TURN_SECONDS:
+            _keep_profile(name, attributes, duration, stacks)
+
+
+def _keep_profile(name, attributes, duration, stacks):
+    profile = {
+        "profile_id": uuid.uuid4().hex[:16],
+        "name": name,
+        "attributes": attributes,
+        "started_at": time.time() - duration,
+        "duration": duration,
+        "samples": sum(stacks.values()),
+        "collapsed": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()),
+    }
+    slow_profiles.append(profile)
+
+    if config.PROFILE_DIR:
+        try:
+            os.makedirs(config.PROFILE_DIR, exist_ok=True)
+            path = os.path.join(config.PROFILE_DIR, f"{profile['profile_id']}.collapsed")
+            with open(path, "w") as f:
+                f.write(profile["collapsed"] + "\n")
+        except OSError as e:
+            print(f"Failed to write profile: {e}")
+
+
+# Returns the kept profiles, newest first, without their stacks.
+def list_profiles():
+    return [{k: v for k, v in profile.items() if k != "collapsed"} for profile in reversed(slow_profiles)]
+
+
+# Returns one kept profile by id, or None.
+def get_profile(profile_id):
+    for profile in slow_profiles:
+        if profile["profile_id"] == profile_id:
+            return profile
+    return None
@@ -0,0 +1,130 @@
+import ast
+import json
+
+# Reply formatting for tool results returned by the agent.
+# Each formatter takes the tool call's arguments and the tool's parsed result
+# and returns the text sent back to the user.
+
+# Arguments a tool call must carry before its result is shown to the user.
+REQUIRED_PARAMS = {
+    "book_hotel": ["location", "check_in", "check_out", "guests", "room_type"],
+    "book_restaurant": ["location", "date", "time", "guests", "cuisine"],
+    "book_restaurant_vote": ["group_id"],
+    "get_restaurant_vote_results": ["group_id"],
+    "execute_restaurant_booking_with_votes": ["group_id", "location", "date", "time", "guests", "cuisine"],
+    "book_cab": ["pickup_location", "destination"],
+    "book_flight": ["origin", "destination", "departure_date"],
+    "initiate_vote": ["group_id", "title", "options"],
+}
+
+# Tools whose replies are better left to the model's own final message (e.g. image generation, counting).
+EXCLUDED_TOOLS = {"count_vote_result", "generate_image"}
+
+
+# Parses a ToolMessage's content back into the tool's return value.
+# Tool results are serialized as JSON; Python literals are accepted as a fallback, never eval'd.
+def parse_tool_content(content):
+    if not isinstance(content, str):
+        return content
+    try:
+        return json.loads(content)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(content)
+    except (ValueError, SyntaxError):
+        return content
+
+
+# Returns the required arguments missing from a tool call.
+def missing_params(tool_name, args):
+    return [p for p in REQUIRED_PARAMS.get(tool_name, []) if
+            p not in args or not args[p] or args[p] == "undefined"]
+
+
+def _format_book_hotel(args, tool_result):
+    return f"✅ Hotel booking confirmed!\n\n🏨 Hotel: {tool_result['hotel']}\n📍 Location: {tool_result['location']}\n📅 Check-in: {tool_result['check_in']}\n📅 Check-out: {tool_result['check_out']}\n👥 Guests: {tool_result['guests']}\n🛏️ Room Type: {tool_result['room_type']}\n🌙 Nights: {tool_result['nights']}\n💰 Total Price: ${tool_result['total_price']}\n🆔 Confirmation ID: {tool_result['confirmation_id']}"
+
+
+def _format_book_restaurant(args, tool_result):
+    return f"✅ Restaurant reservation confirmed!\n\n🍽️ Restaurant: {tool_result['restaurant']}\n📍 Location: {tool_result['location']}\n📅 Date: {tool_result['date']}\n🕐 Time: {tool_result['time']}\n👥 Guests: {tool_result['guests']}\n🍴 Cuisine: {tool_result['cuisine']}\n💰 Estimated Total: ${tool_result['total_estimated_price']}\n🆔 Reservation ID: {tool_result['reservation_id']}"
+
+
+def _format_book_restaurant_vote(args, tool_result):
+    if tool_result.get("status") == "votes_created":
+        created_votes = tool_result.get("created_votes", [])
+        vote_count = len(created_votes)
+        return f"✅ Created {vote_count} restaurant booking votes in group {tool_result['group_id']}!\n\n📊 Votes created for: {', '.join(created_votes)}\n🗳️ Group members can now vote on each category separately.\n\nOnce all votes are complete, you can check the results and make the final booking."
+    elif tool_result.get("status") == "no_votes_needed":
+        return f"✅ All restaurant booking parameters are already provided for group {tool_result['group_id']}!\n\nYou can proceed directly to booking with the provided parameters."
+    else:
+        return f"✅ Restaurant booking vote created!\n\n🍽️ Group: {tool_result['group_id']}\n📊 Status: Gathering preferences\n\nThe group will vote on the missing preferences, then you can use the final booking once all votes are collected."
+
+
+def _format_get_restaurant_vote_results(args, tool_result):
+    if tool_result.get("status") == "no_votes_found":
+        return f"📊 **Restaurant Vote Results**\n\n{tool_result.get('message', 'No votes found')}"
+
+    # Format the vote results
+    results_text = "📊 **Restaurant Vote Results**\n\n"
+    for option, votes in tool_result.get('results', {}).items():
+        results_text += f"• {option}: {votes} votes\n"
+
+    results_text += f"\n🏆 **Winning Options:**\n"
+    winning_options = tool_result.get('winning_options', {})
+    for param, value in winning_options.items():
+        results_text += f"• {param.title()}: {value}\n"
+
+    return results_text
+
+
+def _format_execute_restaurant_booking_with_votes(args, tool_result):
+    if tool_result.get("status") == "booking_confirmed":
+        booking_details = tool_result.get("booking_details", {})
+        return f"✅ Restaurant booking confirmed based on group votes!\n\n🍽️ Restaurant: {booking_details['restaurant']}\n📍 Location: {booking_details['location']}\n📅 Date: {booking_details['date']}\n🕐 Time: {booking_details['time']}\n👥 Guests: {booking_details['guests']}\n🍴 Cuisine: {booking_details['cuisine']}\n💰 Estimated Total: ${booking_details['total_estimated_price']}\n🆔 Reservation ID: {booking_details['reservation_id']}\n\n🎉 Booking completed based on group votes!"
+    return f"✅ Restaurant booking executed for group {tool_result.get('group_id', 'unknown')}"
+
+
+def _format_book_flight(args, tool_result):
+    flight_details = tool_result.get('flight_details', {})
+    pricing = tool_result.get('pricing', {})
+
+    return f"✅ Flight booking confirmed!\n\n✈️ Airline: {tool_result['airline']} ({tool_result['airline_code']})\n🛫 Origin: {tool_result['origin']}\n🛬 Destination: {tool_result['destination']}\n📅 Departure: {tool_result['departure_date']} at {flight_details.get('departure_time', 'N/A')}\n👥 Passengers: {tool_result['passengers']}\n💺 Cabin Class: {tool_result['cabin_class'].title()}\n\n🛩️ Flight Details:\n• Flight Number: {flight_details.get('flight_number', 'N/A')}\n• Aircraft: {flight_details.get('aircraft', 'N/A')}\n• Duration: {flight_details.get('duration_hours', 'N/A')} hours\n• Terminal: {flight_details.get('terminal', 'N/A')}\n• Gate: {flight_details.get('gate', 'N/A')}\n\n💰 Pricing:\n• Base Fare: ${pricing.get('base_fare', 0):.2f}\n• Taxes: ${pricing.get('taxes', 0):.2f}\n• Total: ${pricing.get('total', 0):.2f}\n\n🆔 Confirmation ID: {tool_result['confirmation_id']}"
+
+
+def _format_book_cab(args, tool_result):
+    return f"✅ Cab booking confirmed!\n\n🚕 Company: {tool_result['company']}\n👨‍💼 Driver: {tool_result['driver_name']} (⭐ {tool_result['driver_rating']})\n🚗 Vehicle: {tool_result['vehicle_info']['model']} ({tool_result['vehicle_info']['color']}, {tool_result['vehicle_info']['year']})\n📍 Pickup: {tool_result['pickup_location']}\n🎯 Destination: {tool_result['destination']}\n📅 Date: {tool_result['date']}\n🕐 Time: {tool_result['time']}\n👥 Passengers: {tool_result['passengers']}\n🚙 Cab Type: {tool_result['cab_type'].title()}\n📏 Distance: {tool_result['distance_km']} km\n⏱️ Duration: ~{tool_result['estimated_duration_minutes']} minutes\n💰 Base Fare: ${tool_result['base_fare']}\n💳 Booking Fee: ${tool_result['booking_fee']}\n💵 Total Fare: ${tool_result['total_fare']}\n💳 Payment: {tool_result['payment_method'].title()}\n🆔 Booking ID: {tool_result['booking_id']}"
+
+
+def _format_initiate_vote(args, tool_result):
+    return f"✅ Vote initiated successfully!\n\n📊 Title: {args['title']}\n👥 Group: {args['group_id']}\n🗳️ Options: {', '.join(args['options'])}"
+
+
+def _format_download_video(args, tool_result):
+    return f"📹 Video download initiated for: {args.get('video_url', 'unknown URL')}"
+
+
+def _format_transcribe(args, tool_result):
+    return f"📝 Transcription completed for: {args.get('video_url', 'unknown URL')}"
+
+
+FORMATTERS = {
+    "book_hotel": _format_book_hotel,
+    "book_restaurant": _format_book_restaurant,
+    "book_restaurant_vote": _format_book_restaurant_vote,
+    "get_restaurant_vote_results": _format_get_restaurant_vote_results,
+    "execute_restaurant_booking_with_votes": _format_execute_restaurant_booking_with_votes,
+    "book_flight": _format_book_flight,
+    "book_cab": _format_book_cab,
+    "initiate_vote": _format_initiate_vote,
+    "download_video": _format_download_video,
+    "transcribe": _format_transcribe,
+}
+
+
+# Formats the reply for one tool call from its arguments and its result.
+def format_tool_response(tool_name, args, tool_result):
+    formatter = FORMATTERS.get(tool_name)
+    if formatter is None:
+        return f"All parameters collected for `{tool_name}`: {args}"
+    return formatter(args, tool_result)
@@ -0,0 +1,97 @@
+import re
+import time
+
+from app.config import config
+from app.responses import format_tool_response
+from app.store import get_poll_tally, option_label, polls, selector_index
+
+# Deterministic fast path in front of the LLM agent.
+# Structured commands such as "count votes" or "restaurant results for group X" are
+# matched by pattern and answered straight from the vote tools, with no model call.
+# The tool modules are imported on the first hit, like the agent's own tools.
+
+_GROUP = r"(?:\s+(?:for|in|of)\s+(?:the\s+)?group\s+(?P<group_id>[\w-]+))"
+
+
+# "count votes", "count the votes in group Arz7KwQDd9m"
+def _count_votes(match):
+    from app.tools.start_vote import count_vote_result
+
+    group_id = match.group("group_id")
+    result = count_vote_result.invoke({"group_id": group_id} if group_id else {})
+    return result or "No votes found."
+
+
+# "restaurant results for group Arz7KwQDd9m", "results for group Arz7KwQDd9m"
+def _restaurant_results(match):
+    from app.tools.book_restaurant_vote import get_restaurant_vote_results
+
+    args = {"group_id": match.group("group_id")}
+    return format_tool_response("get_restaurant_vote_results", args, get_restaurant_vote_results.invoke(args))
+
+
+# A re-sent button selector ("vote:<hex>") gets the current tally of its poll.
+def _selector(match):
+    entry = selector_index.get(match.group("selector"))
+    if entry is None:
+        return "This vote is no longer open."
+    group_id, poll_id, _, _ = entry
+    tally = get_poll_tally(polls[group_id][poll_id])
+    return "\n".join(
+        f"{option_label(category, option)}: {votes}"
+        for category, options in tally.items()
+        for option, votes in options.items()
+    )
+
+
+# name -> (pattern, handler). FAST_PATH_COMMANDS selects which ones are active.
+COMMANDS = {
+    "count_votes": (
+        re.compile(rf"^(?:please\s+)?count\s+(?:the\s+)?votes?(?:\s+results?)?{_GROUP}?[.!?]*$", re.IGNORECASE),
+        _count_votes,
+    ),
+    "restaurant_results": (
+        re.compile(rf"^(?:show\s+|get\s+)?(?:the\s+)?(?:restaurant\s+)?(?:vote\s+)?results{_GROUP}[.!?]*$", re.IGNORECASE),
+        _restaurant_results,
+    ),
+    "selector": (
+        re.compile(r"^(?P<selector>vote:[0-9a-f]{32})$"),
+        _selector,
+    ),
+}
+
+# Hit counts per command, misses, and the time spent answering hits.
+router_stats = {
+    "hits": {name: 0 for name in COMMANDS},
+    "misses": 0,
+    "hit_seconds": 0.0,
+}
+
+
+# Returns the reply for a message matching an enabled command, or None to fall through to the LLM.
+def route_message(text):
+    if not config.FAST_PATH_ENABLED:
+        return None
+
+    text = text.strip()
+    for name in config.FAST_PATH_COMMANDS:
+        pattern, handler = COMMANDS.get(name, (None, None))
+        match = pattern.match(text) if pattern else None
+        if match is None:
+            continue
+
+        started = time.perf_counter()
+        reply = handler(match)
+        router_stats["hits"][name] += 1
+        router_stats["hit_seconds"] += time.perf_counter() - started
+        return reply
+
+    router_stats["misses"] += 1
+    return None
+
+
+# Returns the router counters with the overall hit ratio.
+def get_router_stats():
+    hits = sum(router_stats["hits"].values())
+    total = hits + router_stats["misses"]
+    return dict(router_stats, hits=dict(router_stats["hits"]), hit_ratio=hits / total if total else 0.0)
@@ -0,0 +1,26 @@
+import time
+
+# Startup timing report.
+# Times are seconds since this module was first imported, which app.main does before
+# anything else, so they approximate time since process start.
+
+STARTED_AT = time.monotonic()
+STARTED_AT_WALL = time.time()
+
+# Milestones in seconds since start, and durations of lazily deferred work such as the first agent build.
+startup_timings = {}
+
+
+# Records that a startup milestone was reached now.
+def mark_startup(name):
+    startup_timings[name] = time.monotonic() - STARTED_AT
+
+
+# Records how long a piece of deferred startup work took.
+def record_startup(name, seconds):
+    startup_timings.setdefault(name, seconds)
+
+
+# Returns the startup timings and the current uptime.
+def get_startup_report():
+    return dict(startup_timings, started_at=STARTED_AT_WALL, uptime_seconds=time.monotonic() - STARTED_AT)
@@ -1,4 +1,289 @@
-# Temporary in-memory message queue. You may persist this to a database in production.
-message_queue = []
-# Temporary in-memory vote options mapping. Consider storing in a database for long-term storage.
-vote_option_map = {}
\ No newline at end of file
+import threading
+import time
+import uuid
+
+from app.config import config
+from app.metrics import poll_create_seconds, vote_seconds
+from app.message_log import create_message_log
+from app.timer_wheel import TimerWheel
+
+# Log of incoming messages: a bounded in-memory ring buffer, or SQLite when
+# MESSAGE_LOG_BACKEND=sqlite so messages and poll state survive a restart.
+message_queue = create_message_log()
+
+# In-memory poll registry, saved to the message log by flush_store() when the backend is durable.
+# group_id -> poll_id -> poll record:
+# {
+#     "poll_id": "3f2a...",
+#     "group_id": "Arz7KwQDd9m",
+#     "kind": "restaurant",
+#     "title": "Restaurant booking",
+#     "created_at": 1718000000.0,
+#     "status": "open",
+#     "closes_at": 1718086400.0,   # None when the poll never expires
+#     "categories": {
+#         "location": {
+#             "London": {"selector": "vote:137b...", "votes": 2},
+#             "Beijing": {"selector": "vote:8316...", "votes": 0}
+#         }
+#     }
+# }
+# A closed poll drops "categories" and its selectors; it keeps "closed_at" and the frozen tally as
+# "result": {"location": {"London": 2, "Beijing": 0}}, until POLL_CLOSED_RETENTION_SECONDS have passed.
+polls = {}
+# Reverse lookup from a button selector to its option, for open polls only:
+# selector -> (group_id, poll_id, category, option)
+selector_index = {}
+
+POLL_OPEN = "open"
+POLL_CLOSED = "closed"
+
+# Poll deadlines: ("close", group_id, poll_id) at closes_at and ("purge", group_id, poll_id) once a
+# closed result has been kept long enough. Fired by app.poll_lifecycle.
+poll_timers = TimerWheel(config.POLL_TIMER_TICK_SECONDS, config.POLL_TIMER_SLOTS)
+# Polls closed and closed polls purged since startup.
+lifecycle_stats = {"closed": 0, "purged": 0}
+
+# Category used by polls that only ask a single question, such as initiate_vote.
+DEFAULT_CATEGORY = "default"
+
+# Guards poll registry changes made from tool threads and the ingest loop.
+_poll_lock = threading.Lock()
+# Polls changed since they were last written to the message log, as (group_id, poll_id).
+_dirty_polls = set()
+# Time of the last message log compaction.
+_last_compaction = time.monotonic()
+
+# Creates an empty open poll for a group and returns its poll_id.
+# It closes after ttl_seconds (default POLL_TTL_SECONDS; 0 = never).
+def create_poll(group_id, kind, title=None, ttl_seconds=None):
+    poll_id = uuid.uuid4().hex
+    created_at = time.time()
+    ttl_seconds = config.POLL_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    closes_at = created_at + ttl_seconds if ttl_seconds > 0 else None
+    with _poll_lock:
+        polls.setdefault(group_id, {})[poll_id] = {
+            "poll_id": poll_id,
+            "group_id": group_id,
+            "kind": kind,
+            "title": title,
+            "created_at": created_at,
+            "status": POLL_OPEN,
+            "closes_at": closes_at,
+            "categories": {},
+        }
+        _dirty_polls.add((group_id, poll_id))
+    if closes_at is not None:
+        poll_timers.schedule(("close", group_id, poll_id), closes_at)
+    return poll_id
+
+# Adds a category of options to a poll, creating a unique selector per option.
+# Returns a list of (option, selector) pairs in the order given.
+def add_poll_category(group_id, poll_id, category, options):
+    selectors = []
+    with _poll_lock:
+        poll = polls[group_id][poll_id]
+        entries = poll["categories"].setdefault(category, {})
+        for option in options:
+            selector = f"vote:{uuid.uuid4().hex}"
+            entries[option] = {"selector": selector, "votes": 0}
+            selector_index[selector] = (group_id, poll_id, category, option)
+            selectors.append((option, selector))
+        _dirty_polls.add((group_id, poll_id))
+    return selectors
+
+# Records that a poll's group messages were sent: how many, and how long creation took
+# from create_poll until the last message went out. Returns the creation time in seconds.
+def mark_poll_sent(group_id, poll_id, messages):
+    with _poll_lock:
+        poll = polls[group_id][poll_id]
+        creation_seconds = time.time() - poll["created_at"]
+        poll["creation_seconds"] = creation_seconds
+        poll["messages_sent"] = messages
+        _dirty_polls.add((group_id, poll_id))
+    poll_create_seconds.observe(creation_seconds, kind=poll["kind"])
+    return creation_seconds
+
+# Records a single incoming vote message against its selector.
+# Returns True if the message matched a known vote option.
+def record_vote(message_text):
+    with vote_seconds.time(operation="record"):
+        entry = selector_index.get(message_text)
+        if entry is None:
+            return False
+        group_id, poll_id, category, option = entry
+        with _poll_lock:
+            poll = polls.get(group_id, {}).get(poll_id)
+            # The poll may have closed since the selector was looked up
+            if poll is None or poll["status"] != POLL_OPEN:
+                return False
+            poll["categories"][category][option]["votes"] += 1
+            _dirty_polls.add((group_id, poll_id))
+        return True
+
+# Closes an open poll: freezes its tally into "result", drops its options and frees their selectors,
+# so stale buttons stop matching. Returns a copy of the closed record, or None if the poll is not open.
+def close_poll(group_id, poll_id):
+    with _poll_lock:
+        poll = polls.get(group_id, {}).get(poll_id)
+        if poll is None or poll["status"] != POLL_OPEN:
+            return None
+        result = {
+            category: {option: entry["votes"] for option, entry in options.items()}
+            for category, options in poll["categories"].items()
+        }
+        for options in poll["categories"].values():
+            for entry in options.values():
+                selector_index.pop(entry["selector"], None)
+        # Replace the record rather than changing it, so readers holding the open record stay consistent
+        closed = {key: value for key, value in poll.items() if key != "categories"}
+        closed.update(status=POLL_CLOSED, closed_at=time.time(), result=result)
+        polls[group_id][poll_id] = closed
+        _dirty_polls.add((group_id, poll_id))
+        lifecycle_stats["closed"] += 1
+        closed = _copy_poll(closed)
+
+    poll_timers.cancel(("close", group_id, poll_id))
+    if config.POLL_CLOSED_RETENTION_SECONDS > 0:
+        poll_timers.schedule(("purge", group_id, poll_id), closed["closed_at"] + config.POLL_CLOSED_RETENTION_SECONDS)
+    return closed
+
+# Removes a closed poll from the registry and the message log. Returns True if it was removed.
+def purge_poll(group_id, poll_id):
+    with _poll_lock:
+        group = polls.get(group_id, {})
+        poll = group.get(poll_id)
+        if poll is None or poll["status"] != POLL_CLOSED:
+            return False
+        del group[poll_id]
+        if not group:
+            del polls[group_id]
+        _dirty_polls.discard((group_id, poll_id))
+        lifecycle_stats["purged"] += 1
+    message_queue.delete_polls([poll_id])
+    return True
+
+# Returns the polls of one group, optionally limited to one kind, oldest first.
+def get_group_polls(group_id, kind=None):
+    group_polls = list(polls.get(group_id, {}).values())
+    if kind is not None:
+        group_polls = [poll for poll in group_polls if poll["kind"] == kind]
+    return group_polls
+
+# Returns polls matching the filters, newest first, for inspection.
+# since/until bound the creation time; records are copies so callers can serialize them freely.
+def query_polls(group_id=None, kind=None, status=None, since=None, until=None, offset=0, limit=100):
+    with _poll_lock:
+        groups = [polls.get(group_id, {})] if group_id is not None else list(polls.values())
+        matched = [
+            poll for group in groups for poll in group.values()
+            if (kind is None or poll["kind"] == kind)
+            and (status is None or poll["status"] == status)
+            and (since is None or poll["created_at"] >= since)
+            and (until is None or poll["created_at"] < until)
+        ]
+        matched.sort(key=lambda poll: poll["created_at"], reverse=True)
+        return [_copy_poll(poll) for poll in matched[offset:offset + limit]]
+
+# Returns a copy of one poll by its poll_id, or None.
+def get_poll(poll_id):
+    with _poll_lock:
+        for group in polls.values():
+            if poll_id in group:
+                return _copy_poll(group[poll_id])
+    return None
+
+# Returns the number of polls in the registry.
+def poll_count():
+    return sum(len(group) for group in list(polls.values()))
+
+# Returns open and closed poll counts, live selectors, pending timers and lifecycle counters.
+def get_poll_lifecycle_stats():
+    with _poll_lock:
+        open_polls = sum(1 for group in polls.values() for poll in group.values() if poll["status"] == POLL_OPEN)
+        total = sum(len(group) for group in polls.values())
+        selectors = len(selector_index)
+    return {
+        "open": open_polls,
+        "closed": total - open_polls,
+        "selectors": selectors,
+        "timers": len(poll_timers),
+        "closed_total": lifecycle_stats["closed"],
+        "purged_total": lifecycle_stats["purged"],
+    }
+
+# Returns the vote count of every option in a poll: category -> {option: votes}.
+# Closed polls return their frozen result.
+def get_poll_tally(poll):
+    with vote_seconds.time(operation="tally"):
+        if poll["status"] == POLL_CLOSED:
+            return {category: dict(options) for category, options in poll["result"].items()}
+        return {
+            category: {option: entry["votes"] for option, entry in list(options.items())}
+            for category, options in list(poll["categories"].items())
+        }
+
+# Display label of an option, prefixed by its category unless it is the default one.
+def option_label(category, option):
+    if category == DEFAULT_CATEGORY:
+        return option
+    return f"{category.title()}: {option}"
+
+# Copies a poll record so it can be written without holding references into the registry.
+def _copy_poll(poll):
+    copied = dict(poll)
+    if "categories" in poll:
+        copied["categories"] = {
+            category: {option: dict(entry) for option, entry in options.items()}
+            for category, options in poll["categories"].items()
+        }
+    if "result" in poll:
+        copied["result"] = {category: dict(options) for category, options in poll["result"].items()}
+    return copied
+
+# Writes pending messages and changed polls to the message log, compacting it
+# every MESSAGE_LOG_COMPACT_INTERVAL seconds. Called by the poller after each batch.
+def flush_store():
+    global _last_compaction
+    message_queue.flush()
+
+    with _poll_lock:
+        dirty = [polls[group_id][poll_id] for group_id, poll_id in _dirty_polls
+                 if poll_id in polls.get(group_id, {})]
+        # Copy under the lock so a concurrent vote never changes a record mid-write
+        records = [_copy_poll(poll) for poll in dirty]
+        _dirty_polls.clear()
+    message_queue.save_polls(records)
+
+    if time.monotonic() - _last_compaction >= config.MESSAGE_LOG_COMPACT_INTERVAL:
+        _last_compaction = time.monotonic()
+        removed = message_queue.compact()
+        if removed:
+            print(f"Compacted message log: removed {removed} messages")
+
+# Reloads polls saved in the message log, rebuilds the selector index of open polls and
+# schedules their deadlines; polls that expired while the bot was down close on the first tick.
+# Called once on startup; a no-op for the in-memory backend.
+def restore_polls():
+    timers = []
+    with _poll_lock:
+        # Saves re-insert records, so the log returns them in last-save order; group polls are kept oldest first
+        for poll in sorted(message_queue.load_polls(), key=lambda poll: poll["created_at"]):
+            group_id, poll_id = poll["group_id"], poll["poll_id"]
+            # Polls saved before the lifecycle existed are open and get the default TTL
+            if "status" not in poll:
+                poll["status"] = POLL_OPEN
+                poll["closes_at"] = poll["created_at"] + config.POLL_TTL_SECONDS if config.POLL_TTL_SECONDS > 0 else None
+            polls.setdefault(group_id, {})[poll_id] = poll
+
+            if poll["status"] == POLL_OPEN:
+                for category, options in poll["categories"].items():
+                    for option, entry in options.items():
+                        selector_index[entry["selector"]] = (group_id, poll_id, category, option)
+                if poll["closes_at"] is not None:
+                    timers.append((("close", group_id, poll_id), poll["closes_at"]))
+            elif config.POLL_CLOSED_RETENTION_SECONDS > 0:
+                timers.append((("purge", group_id, poll_id), poll["closed_at"] + config.POLL_CLOSED_RETENTION_SECONDS))
+
+    for key, deadline in timers:
+        poll_timers.schedule(key, deadline)
@@ -0,0 +1,105 @@
+import re
+
+# Structured summaries of compacted conversation history.
+# Older turns are folded into a small record of what was confirmed (bookings, votes) and which
+# tool calls are still waiting for details, read back from the replies formatted by app.responses.
+# The summary is rendered as one system message in front of the turns that are kept verbatim.
+
+# First line of a success reply: "✅ Hotel booking confirmed!"
+_CONFIRMATION = re.compile(r"^✅\s*(?P<action>[^\n!]+)")
+# Detail lines: "🏨 Hotel: The Savoy", "• Flight Number: LH123"
+_DETAIL = re.compile(r"^[^\w\n]*(?P<key>[A-Za-z][\w ()-]*?):[ \t]*(?P<value>\S.*)$", re.MULTILINE)
+# Reply asking for missing arguments: "Got partial info for `book_hotel`. Please provide: check_in, guests"
+_PARTIAL = re.compile(r"Got partial info for `(?P<tool>\w+)`\. Please provide: (?P<missing>[^\n]+)")
+
+# Boundaries between the tool results of one reply
+_REPLY_BLOCKS = re.compile(r"\n\n(?=✅|Got partial info|❌)")
+
+# Confirmation titles that complete a pending tool call.
+_CONFIRMED_TOOLS = [
+    ("Hotel booking", "book_hotel"),
+    ("Restaurant reservation", "book_restaurant"),
+    ("Restaurant booking confirmed based on group votes", "execute_restaurant_booking_with_votes"),
+    ("Restaurant booking executed", "execute_restaurant_booking_with_votes"),
+    ("Flight booking", "book_flight"),
+    ("Cab booking", "book_cab"),
+    ("Vote initiated", "initiate_vote"),
+]
+
+# Confirmed actions kept in a summary (oldest dropped first), and the longest kept text fragments.
+MAX_CONFIRMED = 10
+MAX_VALUE_CHARS = 80
+MAX_REQUEST_CHARS = 200
+
+
+def _shorten(text, limit):
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _confirmed_tool(action):
+    for prefix, tool_name in _CONFIRMED_TOOLS:
+        if action.startswith(prefix):
+            return tool_name
+    return None
+
+
+def empty_summary():
+    return {"confirmed": [], "pending": {}, "compacted_messages": 0}
+
+
+# Folds older messages, oldest first, into a summary and returns the updated summary.
+# The input summary is not modified.
+def summarize_history(summary, messages):
+    summary = summary or empty_summary()
+    confirmed = list(summary["confirmed"])
+    pending = dict(summary["pending"])
+
+    last_request = ""
+    for message in messages:
+        content = str(message.get("content", ""))
+        if message.get("role") == "user":
+            last_request = content
+            continue
+
+        # One reply can hold several tool results separated by blank lines
+        for block in _REPLY_BLOCKS.split(content):
+            confirmation = _CONFIRMATION.match(block)
+            if confirmation:
+                action = confirmation.group("action").strip()
+                details = [
+                    f"{match.group('key').strip()}: {_shorten(match.group('value'), MAX_VALUE_CHARS)}"
+                    for match in _DETAIL.finditer(block)
+                ]
+                confirmed.append({"action": action, "details": details})
+                pending.pop(_confirmed_tool(action), None)
+
+            for partial in _PARTIAL.finditer(block):
+                pending[partial.group("tool")] = {
+                    "missing": [p.strip() for p in partial.group("missing").split(",") if p.strip()],
+                    "request": _shorten(last_request, MAX_REQUEST_CHARS),
+                }
+
+    return {
+        "confirmed": confirmed[-MAX_CONFIRMED:],
+        "pending": pending,
+        "compacted_messages": summary["compacted_messages"] + len(messages),
+    }
+
+
+# Renders a summary as the text of the system message placed before the recent turns.
+def render_summary(summary):
+    lines = ["Summary of the earlier conversation (older messages were compacted):"]
+    if summary["confirmed"]:
+        lines.append("Confirmed:")
+        for entry in summary["confirmed"]:
+            details = f" ({'; '.join(entry['details'])})" if entry["details"] else ""
+            lines.append(f"- {entry['action']}{details}")
+    if summary["pending"]:
+        lines.append("Still waiting for details:")
+        for tool_name, entry in summary["pending"].items():
+            request = f' (user asked: "{entry["request"]}")' if entry["request"] else ""
+            lines.append(f"- {tool_name}: needs {', '.join(entry['missing'])}{request}")
+    if len(lines) == 1:
+        lines.append("Nothing was booked or left pending.")
+    return "\n".join(lines)
@@ -0,0 +1,76 @@
+import asyncio
+import math
+import threading
+import time
+
+
+# Hashed timer wheel for many long-lived deadlines, driven by an asyncio task.
+# Time is cut into ticks of tick_seconds; a timer for tick t waits in slot t % slots, so each tick
+# only looks at one slot instead of every timer, and scheduling or cancelling is O(1).
+# Deadlines are wall-clock times, so timers restored after a restart keep their meaning.
+# schedule() and cancel() are thread-safe and may be called from tool threads; run() fires
+# due timers on the event loop, at most one tick late.
+class TimerWheel:
+    def __init__(self, tick_seconds=1.0, slots=512):
+        self.tick_seconds = tick_seconds
+        self._slots = [set() for _ in range(max(1, slots))]
+        # key -> (deadline, tick)
+        self._timers = {}
+        # Next tick to process
+        self._next_tick = self._tick(time.time())
+        self._lock = threading.Lock()
+        self.fired = 0
+
+    def _tick(self, timestamp):
+        return int(timestamp // self.tick_seconds)
+
+    # Schedules key to fire at deadline (time.time() seconds), replacing an earlier timer for it.
+    def schedule(self, key, deadline):
+        with self._lock:
+            self._remove(key)
+            # A timer waits for the first tick starting at or after its deadline, so it never fires
+            # early; deadlines already past fire on the next tick
+            tick = max(math.ceil(deadline / self.tick_seconds), self._next_tick)
+            self._timers[key] = (deadline, tick)
+            self._slots[tick % len(self._slots)].add(key)
+
+    def cancel(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            self._slots[timer[1] % len(self._slots)].discard(key)
+
+    # Removes and returns the keys due by now, in deadline order.
+    def advance(self, now=None):
+        now_tick = self._tick(now if now is not None else time.time())
+        due = []
+        with self._lock:
+            if now_tick - self._next_tick >= len(self._slots):
+                # Fell behind a whole turn (e.g. the process was suspended): check every timer once
+                due = [key for key, (_, tick) in self._timers.items() if tick <= now_tick]
+            else:
+                for tick in range(self._next_tick, now_tick + 1):
+                    slot = self._slots[tick % len(self._slots)]
+                    due.extend(key for key in slot if self._timers[key][1] <= tick)
+            due.sort(key=lambda key: self._timers[key][0])
+            for key in due:
+                self._remove(key)
+            self._next_tick = max(self._next_tick, now_tick + 1)
+        self.fired += len(due)
+        return due
+
+    # Fires due timers every tick by awaiting callback(key), until cancelled.
+    async def run(self, callback):
+        while True:
+            await asyncio.sleep(self.tick_seconds - time.time() % self.tick_seconds)
+            for key in self.advance():
+                try:
+                    await callback(key)
+                except Exception as e:
+                    print(f"Timer {key} failed: {e}")
+
+    def __len__(self):
+        return len(self._timers)
@@ -0,0 +1,138 @@
+import json
+import re
+import threading
+
+from app.config import config
+from app.memory import estimate_tokens
+
+# Per-turn tool subset selection.
+# Each tool belongs to a group with trigger keywords. A turn binds only the groups its
+# message mentions plus the groups the session used recently (so slot-filling replies
+# like "4 people" keep their tool), instead of all tool schemas on every request.
+
+# Builds a keyword pattern matching whole words only, so "great" does not match "eat".
+# words are regexes for one keyword each, spelling out the plural and verb forms to accept;
+# cjk keywords have no word boundaries and match anywhere.
+def _keywords(*words, cjk=()):
+    parts = [rf"\b(?:{'|'.join(words)})\b"] if words else []
+    return re.compile("|".join(parts + list(cjk)), re.IGNORECASE)
+
+
+# group -> (tool names, keyword pattern)
+TOOL_GROUPS = {
+    "media": (
+        ["download_video", "transcribe"],
+        _keywords(r"videos?", r"youtube", r"youtu\.be", r"twitter", r"tweets?", r"download(?:s|ed|ing)?", r"transcri\w*"),
+    ),
+    "hotel": (
+        ["book_hotel"],
+        _keywords(r"hotels?", r"motels?", r"hostels?", r"suites?", r"check[- ]?ins?", r"check[- ]?outs?", cjk=["酒店"]),
+    ),
+    "restaurant": (
+        ["book_restaurant", "book_restaurant_vote", "get_restaurant_vote_results", "execute_restaurant_booking_with_votes"],
+        _keywords(r"restaurants?", r"dinners?", r"lunch(?:es)?", r"breakfasts?", r"brunch(?:es)?", r"din(?:e|es|ed|ing)",
+                  r"cuisines?", r"reservations?", cjk=["餐"]),
+    ),
+    "cab": (
+        ["book_cab"],
+        _keywords(r"cabs?", r"taxis?", r"uber", r"lyft", cjk=["车"]),
+    ),
+    "flight": (
+        ["book_flight"],
+        _keywords(r"flights?", r"fl(?:y|ies|ying|ew)", r"airlines?", r"airports?", r"(?:air)?planes?", cjk=["机票", "航班"]),
+    ),
+    "vote": (
+        ["initiate_vote", "count_vote_result"],
+        _keywords(r"vot(?:e|es|ed|ing)", r"polls?", r"polling", r"tall(?:y|ies|ied)", cjk=["投票"]),
+    ),
+    "image": (
+        ["generate_image"],
+        _keywords(r"images?", r"pictures?", r"photos?", r"illustrat\w*", cjk=["图"]),
+    ),
+}
+
+# group -> pattern of weak keywords: words that point at the group but are common in other
+# messages too ("a table", "a room", "ride"). They select the group like the keywords above,
+# but a message whose only match is one weak keyword gets the full toolset.
+WEAK_KEYWORDS = {
+    "hotel": _keywords(r"rooms?", r"stay(?:s|ed|ing)?", r"nights?"),
+    "restaurant": _keywords(r"tables?", r"eat(?:s|ing|en)?"),
+    "cab": _keywords(r"rides?", r"riding", r"drivers?", r"pick(?:ing)? ?ups?", r"drop(?:ping)? ?offs?"),
+    "flight": _keywords(r"depart(?:s|ed|ing|ures?)?"),
+    "image": _keywords(r"draw(?:s|n|ing)?", r"paint(?:s|ed|ing)?"),
+}
+
+# Group of each tool name.
+TOOL_GROUP_OF = {name: group for group, (names, _) in TOOL_GROUPS.items() for name in names}
+
+# Counters comparing the tool-schema tokens bound per turn with the full toolset.
+selection_stats = {
+    "turns": 0,
+    "fallback_turns": 0,
+    "full_tool_tokens_per_turn": 0,
+    "selected_tool_tokens_total": 0,
+}
+_stats_lock = threading.Lock()
+
+
+# Estimated prompt tokens of one tool's schema as sent to the model.
+def tool_schema_tokens(tool):
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+
+    return estimate_tokens(json.dumps(convert_to_openai_tool(tool)))
+
+
+# Returns the tool groups whose keywords, weak or not, appear in a message.
+def match_tool_groups(text):
+    groups = {group for group, (_, pattern) in TOOL_GROUPS.items() if pattern.search(text)}
+    return groups | {group for group, pattern in WEAK_KEYWORDS.items() if pattern.search(text)}
+
+
+# True when a message's only keyword match is a single weak keyword, too little to narrow the toolset on.
+def is_weak_match(text):
+    if any(pattern.search(text) for _, pattern in TOOL_GROUPS.values()):
+        return False
+    return sum(len(pattern.findall(text)) for pattern in WEAK_KEYWORDS.values()) == 1
+
+
+# Picks the tool groups for a turn from the message's matches and the session's recent groups.
+# session_groups maps recently used groups to the number of turns they stay selected.
+# weak_match marks matches resting on a single weak keyword; unless the session already uses that
+# group they get the full toolset too.
+# Returns (groups, fallback); fallback is True when nothing applies and the full toolset is used.
+def select_tool_groups(matched_groups, session_groups=None, weak_match=False):
+    groups = set(matched_groups) | set(session_groups or {})
+    if weak_match and not set(matched_groups) <= set(session_groups or {}):
+        return set(TOOL_GROUPS), True
+    if not config.TOOL_SELECTION_ENABLED or not groups:
+        return set(TOOL_GROUPS), True
+    return groups, False
+
+
+# Session groups to carry into the next turn: the groups picked now get a fresh lease,
+# older ones count down and expire after TOOL_SELECTION_MEMORY_TURNS turns.
+def next_session_groups(session_groups, matched_groups):
+    carried = {group: turns - 1 for group, turns in (session_groups or {}).items() if turns > 1}
+    for group in matched_groups:
+        carried[group] = config.TOOL_SELECTION_MEMORY_TURNS
+    return carried
+
+
+# Records the schema tokens bound for one turn.
+def record_selection(selected_tokens, full_tokens, fallback):
+    with _stats_lock:
+        selection_stats["turns"] += 1
+        selection_stats["fallback_turns"] += int(fallback)
+        selection_stats["full_tool_tokens_per_turn"] = full_tokens
+        selection_stats["selected_tool_tokens_total"] += selected_tokens
+
+
+# Returns the token counters with per-turn averages before (full toolset) and after selection.
+def get_selection_stats():
+    with _stats_lock:
+        stats = dict(selection_stats)
+    turns = stats["turns"]
+    average = stats["selected_tool_tokens_total"] / turns if turns else 0.0
+    stats["avg_selected_tool_tokens_per_turn"] = average
+    stats["avg_tool_tokens_saved_per_turn"] = stats["full_tool_tokens_per_turn"] - average if turns else 0.0
+    return stats
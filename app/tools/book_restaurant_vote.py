@@ -1,11 +1,11 @@
 import random
-import uuid
-from typing import Dict, Any
+from typing import Dict, Any, List
 from datetime import datetime
 from langchain.tools import tool
 
-from app.utils import send_group_message
-from app.store import vote_option_map, message_queue
+from app.config import config
+from app.utils import send_group_message, send_group_messages
+from app.store import add_poll_category, create_poll, get_group_polls, get_poll_tally, mark_poll_sent, option_label
 from app.tools.book_restaurant import book_restaurant
 
 @tool
@@ -31,30 +31,37 @@ def book_restaurant_vote(
     
     # Track which votes were created
     created_votes = []
+
+    # All category votes of this request belong to one poll of the group
+    if not all([location, date, time, guests, cuisine]):
+        poll_id = create_poll(group_id, "restaurant", "Restaurant booking")
+    
+    # Register a separate vote for each missing category; their messages are sent together below
+    vote_messages = []
     
     # Create separate vote for location if missing
     if not location:
-        location_vote = _create_location_vote(group_id)
+        vote_messages.append(_create_location_vote(group_id, poll_id))
         created_votes.append("location")
     
     # Create separate vote for date if missing
     if not date:
-        date_vote = _create_date_vote(group_id)
+        vote_messages.append(_create_date_vote(group_id, poll_id))
         created_votes.append("date")
     
     # Create separate vote for time if missing
     if not time:
-        time_vote = _create_time_vote(group_id)
+        vote_messages.append(_create_time_vote(group_id, poll_id))
         created_votes.append("time")
     
     # Create separate vote for guests if missing
     if not guests:
-        guests_vote = _create_guests_vote(group_id)
+        vote_messages.append(_create_guests_vote(group_id, poll_id))
         created_votes.append("guests")
     
     # Create separate vote for cuisine if missing
     if not cuisine:
-        cuisine_vote = _create_cuisine_vote(group_id)
+        vote_messages.append(_create_cuisine_vote(group_id, poll_id))
         created_votes.append("cuisine")
     
     if not created_votes:
@@ -71,6 +78,8 @@ def book_restaurant_vote(
             }
         }
     
+    _send_vote_messages(group_id, poll_id, created_votes, vote_messages)
+    
     return {
         "status": "votes_created",
         "message": f"✅ Created {len(created_votes)} restaurant booking votes in group {group_id}",
@@ -92,8 +101,40 @@ def book_restaurant_vote(
         }
     }
 
-def _create_location_vote(group_id: str) -> None:
-    """Create a vote for restaurant location preference."""
+# Posts the category votes of a poll according to POLL_MESSAGE_MODE and records how long creating the poll took.
+# The category votes are independent, so by default their messages are sent concurrently.
+def _send_vote_messages(group_id: str, poll_id: str, categories: List[str], vote_messages: List[Dict[str, Any]]) -> None:
+    mode = config.POLL_MESSAGE_MODE
+    if mode == "coalesced":
+        vote_messages = _coalesce_vote_messages(categories, vote_messages)
+    send_group_messages(group_id, vote_messages, ordered=mode == "serial")
+    mark_poll_sent(group_id, poll_id, len(vote_messages))
+
+# Packs category votes into as few messages as POLL_COALESCE_MAX_BUTTONS allows, keeping each
+# category's buttons in one message. Button names get their category so they stay unambiguous.
+def _coalesce_vote_messages(categories: List[str], vote_messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    messages = []
+    titles, buttons = [], []
+    for category, vote_message in zip(categories, vote_messages):
+        category_buttons = [dict(button, name=option_label(category, button["name"])) for button in vote_message["button"]]
+        if buttons and len(buttons) + len(category_buttons) > config.POLL_COALESCE_MAX_BUTTONS:
+            messages.append(_combined_vote_message(titles, buttons))
+            titles, buttons = [], []
+        titles.append(vote_message["text"].split("\n", 1)[0])
+        buttons.extend(category_buttons)
+    if buttons:
+        messages.append(_combined_vote_message(titles, buttons))
+    return messages
+
+def _combined_vote_message(titles: List[str], buttons: List[Dict[str, Any]]) -> Dict[str, Any]:
+    vote_message = "🍽️ **Restaurant Booking Vote**\n\nPlease vote once in each category:\n" + "\n".join(titles)
+    return {
+        "text": vote_message,
+        "button": buttons
+    }
+
+def _create_location_vote(group_id: str, poll_id: str) -> Dict[str, Any]:
+    """Create a vote for restaurant location preference and return its message."""
     vote_message = "📍 **Restaurant Location Vote**\n\nWhere would you like to dine?\n\nPlease vote for your preferred location:"
     
     location_options = [
@@ -104,25 +145,21 @@ def _create_location_vote(group_id: str) -> None:
     ]
     
     button_options = []
-    for option in location_options:
-        selector = f"vote:{uuid.uuid4().hex}"
+    for option, selector in add_poll_category(group_id, poll_id, "location", location_options):
         button_options.append({
             "name": option,
             "selector": selector,
             "type": "default",
             "isHidden": "1"
         })
-        vote_option_map[selector] = f"Location: {option}"
     
-    payload = {
+    return {
         "text": vote_message,
         "button": button_options
     }
-    
-    send_group_message(group_id, payload)
 
-def _create_date_vote(group_id: str) -> None:
-    """Create a vote for restaurant date preference."""
+def _create_date_vote(group_id: str, poll_id: str) -> Dict[str, Any]:
+    """Create a vote for restaurant date preference and return its message."""
     vote_message = "📅 **Restaurant Date Vote**\n\nWhen would you like to dine?\n\nPlease vote for your preferred date:"
     
     date_options = [
@@ -133,25 +170,21 @@ def _create_date_vote(group_id: str) -> None:
     ]
     
     button_options = []
-    for option in date_options:
-        selector = f"vote:{uuid.uuid4().hex}"
+    for option, selector in add_poll_category(group_id, poll_id, "date", date_options):
         button_options.append({
             "name": option,
             "selector": selector,
             "type": "default",
             "isHidden": "1"
         })
-        vote_option_map[selector] = f"Date: {option}"
     
-    payload = {
+    return {
         "text": vote_message,
         "button": button_options
     }
-    
-    send_group_message(group_id, payload)
 
-def _create_time_vote(group_id: str) -> None:
-    """Create a vote for restaurant time preference."""
+def _create_time_vote(group_id: str, poll_id: str) -> Dict[str, Any]:
+    """Create a vote for restaurant time preference and return its message."""
     vote_message = "🕐 **Restaurant Time Vote**\n\nWhat time would you like to dine?\n\nPlease vote for your preferred time:"
     
     time_options = [
@@ -162,25 +195,21 @@ def _create_time_vote(group_id: str) -> None:
     ]
     
     button_options = []
-    for option in time_options:
-        selector = f"vote:{uuid.uuid4().hex}"
+    for option, selector in add_poll_category(group_id, poll_id, "time", time_options):
         button_options.append({
             "name": option,
             "selector": selector,
             "type": "default",
             "isHidden": "1"
         })
-        vote_option_map[selector] = f"Time: {option}"
     
-    payload = {
+    return {
         "text": vote_message,
         "button": button_options
     }
-    
-    send_group_message(group_id, payload)
 
-def _create_guests_vote(group_id: str) -> None:
-    """Create a vote for number of guests preference."""
+def _create_guests_vote(group_id: str, poll_id: str) -> Dict[str, Any]:
+    """Create a vote for number of guests preference and return its message."""
     vote_message = "👥 **Number of Guests Vote**\n\nHow many people will be dining?\n\nPlease vote for the number of guests:"
     
     guests_options = [
@@ -191,25 +220,21 @@ def _create_guests_vote(group_id: str) -> None:
     ]
     
     button_options = []
-    for option in guests_options:
-        selector = f"vote:{uuid.uuid4().hex}"
+    for option, selector in add_poll_category(group_id, poll_id, "guests", guests_options):
         button_options.append({
             "name": option,
             "selector": selector,
             "type": "default",
             "isHidden": "1"
         })
-        vote_option_map[selector] = f"Guests: {option}"
     
-    payload = {
+    return {
         "text": vote_message,
         "button": button_options
     }
-    
-    send_group_message(group_id, payload)
 
-def _create_cuisine_vote(group_id: str) -> None:
-    """Create a vote for cuisine preference."""
+def _create_cuisine_vote(group_id: str, poll_id: str) -> Dict[str, Any]:
+    """Create a vote for cuisine preference and return its message."""
     vote_message = "🍴 **Cuisine Preference Vote**\n\nWhat type of cuisine would you prefer?\n\nPlease vote for your preferred cuisine:"
     
     cuisine_options = [
@@ -220,22 +245,18 @@ def _create_cuisine_vote(group_id: str) -> None:
     ]
     
     button_options = []
-    for option in cuisine_options:
-        selector = f"vote:{uuid.uuid4().hex}"
+    for option, selector in add_poll_category(group_id, poll_id, "cuisine", cuisine_options):
         button_options.append({
             "name": option,
             "selector": selector,
             "type": "default",
             "isHidden": "1"
         })
-        vote_option_map[selector] = f"Cuisine: {option}"
     
-    payload = {
+    return {
         "text": vote_message,
         "button": button_options
     }
-    
-    send_group_message(group_id, payload)
 
 @tool
 def get_restaurant_vote_results(group_id: str) -> Dict[str, Any]:
@@ -248,12 +269,16 @@ def get_restaurant_vote_results(group_id: str) -> Dict[str, Any]:
     result_count = {}
     winning_options = {}
     
-    # Count votes for each restaurant vote option
-    for message in message_queue:
-        vote_key = message.get("message_text", "")
-        if vote_key in vote_option_map:
-            option = vote_option_map[vote_key]
-            result_count[option] = result_count.get(option, 0) + 1
+    # Take each category from the most recent restaurant poll of this group that asked it.
+    # Only this group's polls are read, so other groups' votes never leak into the result.
+    category_tallies = {}
+    for poll in get_group_polls(group_id, kind="restaurant"):
+        category_tallies.update(get_poll_tally(poll))
+    
+    for category, options in category_tallies.items():
+        for option, votes in options.items():
+            if votes:
+                result_count[option_label(category, option)] = votes
     
     # If no votes found, return empty results
     if not result_count:
@@ -265,33 +290,11 @@ def get_restaurant_vote_results(group_id: str) -> Dict[str, Any]:
             "winning_options": {}
         }
     
-    # Determine winning options for each category
-    location_votes = {k: v for k, v in result_count.items() if k.startswith("Location: ")}
-    date_votes = {k: v for k, v in result_count.items() if k.startswith("Date: ")}
-    time_votes = {k: v for k, v in result_count.items() if k.startswith("Time: ")}
-    guests_votes = {k: v for k, v in result_count.items() if k.startswith("Guests: ")}
-    cuisine_votes = {k: v for k, v in result_count.items() if k.startswith("Cuisine: ")}
-    
     # Find winners for each category
-    if location_votes:
-        winning_location = max(location_votes.items(), key=lambda x: x[1])
-        winning_options["location"] = winning_location[0].replace("Location: ", "")
-    
-    if date_votes:
-        winning_date = max(date_votes.items(), key=lambda x: x[1])
-        winning_options["date"] = winning_date[0].replace("Date: ", "")
-    
-    if time_votes:
-        winning_time = max(time_votes.items(), key=lambda x: x[1])
-        winning_options["time"] = winning_time[0].replace("Time: ", "")
-    
-    if guests_votes:
-        winning_guests = max(guests_votes.items(), key=lambda x: x[1])
-        winning_options["guests"] = winning_guests[0].replace("Guests: ", "")
-    
-    if cuisine_votes:
-        winning_cuisine = max(cuisine_votes.items(), key=lambda x: x[1])
-        winning_options["cuisine"] = winning_cuisine[0].replace("Cuisine: ", "")
+    for category, options in category_tallies.items():
+        winning_option, winning_votes = max(options.items(), key=lambda x: x[1])
+        if winning_votes:
+            winning_options[category] = winning_option
     
     return {
         "status": "vote_results",
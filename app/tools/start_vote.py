@@ -1,14 +1,13 @@
-import uuid
 from langchain.tools import tool
 
-from app.store import message_queue
-from app.store import vote_option_map
+from app.store import DEFAULT_CATEGORY, polls
+from app.store import add_poll_category, create_poll, get_group_polls, get_poll_tally, mark_poll_sent, option_label
 from app.utils import send_group_message, send_user_message
 
 @tool
 # Tool to initiate a group vote by sending a message with clickable options.
-# This function generates unique selectors for each option and tracks them in memory.
-# NOTE: This is a temporary implementation; vote_option_map should be persisted in a database for production use.
+# This function registers the vote as a poll of the group, with a unique selector for each option.
+# NOTE: This is a temporary implementation; the poll registry should be persisted in a database for production use.
 def initiate_vote(group_id: str, title: str, options: list):
     """
     Initiate a vote in a group.
@@ -33,16 +32,16 @@ def initiate_vote(group_id: str, title: str, options: list):
     if not options:
         raise ValueError("Options are required")
 
+    poll_id = create_poll(group_id, "vote", title)
+
     button_options = []
-    for option in options:
-        selector = f"vote:{uuid.uuid4().hex}"
+    for option, selector in add_poll_category(group_id, poll_id, DEFAULT_CATEGORY, options):
         button_options.append({
             "name": option,
             "selector": selector,
             "type": "default",
             "isHidden": "1"
         })
-        vote_option_map[selector] = option
 
     payload = {
         "text": title,
@@ -50,42 +49,40 @@ def initiate_vote(group_id: str, title: str, options: list):
     }
 
     send_group_message(group_id, payload)
+    mark_poll_sent(group_id, poll_id, 1)
 
 @tool
-# Tool to count the vote results from the in-memory message queue.
-# It tallies votes based on message content and the vote_option_map.
-# NOTE: In production, both the message queue and vote mapping should be persisted in a database.
-def count_vote_result() -> str:
-    """count the vote result."""
-
-    # print(message_queue)
-    # [
-    #     {
-    #         "from_uid": "QseG8BQZyHh",
-    #         "message_text": "vote:138ee59a7c7f4ce088adf3c7fcb3fa88"
-    #     },
-    #     {
-    #         "from_uid": "TZFAq4w9vC3",
-    #         "message_text": "vote:138ee59a7c7f4ce088adf3c7fcb3fa88"
-    #     }
-    # ]
+# Tool to count the vote results from the running per-option tallies in the poll registry.
+# Votes are counted as they are ingested, so this only walks the options of the selected polls.
+# NOTE: In production, both the message queue and the poll registry should be persisted in a database.
+def count_vote_result(group_id: str = None) -> str:
+    """count the vote result. Pass group_id to only count the votes of that group."""
 
-    # print(vote_option_map)
+    # print(polls)
     # {
-    #     "vote:137b2a8fb3cc44da9aecb4d560a78212": "Rock",
-    #     "vote:138ee59a7c7f4ce088adf3c7fcb3fa88": "Paper",
-    #     "vote:8316c54188b043c78174ceb88a07fd2e": "Scissors"
+    #     "Arz7KwQDd9m": {
+    #         "3f2a...": {
+    #             "kind": "vote",
+    #             "categories": {
+    #                 "default": {
+    #                     "Rock": {"selector": "vote:137b...", "votes": 0},
+    #                     "Paper": {"selector": "vote:138e...", "votes": 2}
+    #                 }
+    #             }
+    #         }
+    #     }
     # }
 
-    # Initialize the result count dictionary with all vote options set to 0
-    result_count = {value: 0 for value in vote_option_map.values()}
+    group_ids = [group_id] if group_id else list(polls)
 
-    # Iterate through all messages in the queue to count valid votes
-    for message in message_queue:
-        vote_key = message["message_text"]
-        if vote_key in vote_option_map:
-            option = vote_option_map[vote_key]
-            result_count[option] += 1
+    # Add the running tally of every option in the selected groups' polls
+    result_count = {}
+    for gid in group_ids:
+        for poll in get_group_polls(gid):
+            for category, options in get_poll_tally(poll).items():
+                for option, votes in options.items():
+                    label = option_label(category, option)
+                    result_count[label] = result_count.get(label, 0) + votes
 
     # Format the counted results into a string for display
     result = "\n".join(f"{option}: {count}" for option, count in result_count.items())
@@ -0,0 +1,126 @@
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from app.config import config
+
+# Lightweight span tracing for the message pipeline.
+# A span records one timed step (a poll, an agent turn, a model call, a tool, a Luffa HTTP call)
+# with its parent, so a slow reply can be broken down step by step. The current span is kept in
+# a context variable: child spans opened in the same task or thread, or in a copied context
+# (see run_in_context), attach to it automatically. Finished spans are kept in a bounded buffer
+# and exported as JSON or in the Chrome trace event format (chrome://tracing, Perfetto).
+
+_current_span = contextvars.ContextVar("luffabot_current_span", default=None)
+
+# Finished spans, oldest first.
+finished_spans = deque(maxlen=config.TRACE_MAX_SPANS)
+
+
+def _new_id():
+    return uuid.uuid4().hex[:16]
+
+
+# Returns the span open in the current context, or None.
+def current_span():
+    return _current_span.get()
+
+
+# Starts a span under parent (default: the current span) without making it current.
+# Use for steps reported through callbacks; end it with end_span. Returns None when tracing is off.
+def start_span(name, parent=None, **attributes):
+    if not config.TRACING_ENABLED:
+        return None
+    parent = parent if parent is not None else _current_span.get()
+    thread = threading.current_thread()
+    return {
+        "trace_id": parent["trace_id"] if parent else _new_id(),
+        "span_id": _new_id(),
+        "parent_id": parent["span_id"] if parent else None,
+        "name": name,
+        "start": time.time(),
+        "duration": None,
+        "thread_id": thread.ident,
+        "thread_name": thread.name,
+        "attributes": attributes,
+        "_started": time.perf_counter(),
+    }
+
+
+# Finishes a span started with start_span, recording the error that ended it if any.
+def end_span(record, error=None):
+    if record is None:
+        return
+    record["duration"] = time.perf_counter() - record.pop("_started")
+    if error is not None:
+        record["attributes"]["error"] = repr(error)
+    finished_spans.append(record)
+
+
+# Times the with-block as a span and makes it the current span for the steps inside it.
+@contextmanager
+def span(name, **attributes):
+    record = start_span(name, **attributes)
+    if record is None:
+        yield None
+        return
+
+    token = _current_span.set(record)
+    try:
+        yield record
+    except BaseException as e:
+        end_span(record, error=e)
+        raise
+    else:
+        end_span(record)
+    finally:
+        _current_span.reset(token)
+
+
+# Calls fn in a copy of the current context, so spans it opens on another thread keep their parent.
+# parent_span, when given, becomes the current span inside fn instead.
+# Pass as the callable to run_in_executor: loop.run_in_executor(pool, run_in_context(fn), *args).
+def run_in_context(fn, parent_span=None):
+    context = contextvars.copy_context()
+    if parent_span is not None:
+        context.run(_current_span.set, parent_span)
+
+    def run(*args, **kwargs):
+        return context.run(fn, *args, **kwargs)
+
+    return run
+
+
+# Returns finished spans, newest trace first, limited to one trace or to the latest `limit` spans.
+def get_spans(trace_id=None, limit=1000):
+    spans = list(finished_spans)
+    if trace_id is not None:
+        spans = [record for record in spans if record["trace_id"] == trace_id]
+    return spans[-limit:][::-1]
+
+
+# Converts spans to the Chrome trace event format.
+def to_chrome_trace(spans):
+    pid = os.getpid()
+    events = []
+    threads = {}
+    for record in spans:
+        threads[record["thread_id"]] = record["thread_name"]
+        events.append({
+            "name": record["name"],
+            "cat": record["name"].split(".")[0],
+            "ph": "X",
+            "ts": record["start"] * 1e6,
+            "dur": (record["duration"] or 0.0) * 1e6,
+            "pid": pid,
+            "tid": record["thread_id"],
+            "args": dict(record["attributes"], trace_id=record["trace_id"], span_id=record["span_id"],
+                         parent_id=record["parent_id"]),
+        })
+    for thread_id, thread_name in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": thread_name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.metrics import llm_seconds, llm_turn_seconds, tool_errors, tool_seconds, tool_turn_seconds
+from app.tracing import current_span, end_span, start_span
+
+
+# Splits one agent turn's time into model time and tool time through LangChain callbacks,
+# and records each model call and tool run as a span under the turn's span.
+# Passed to the agent per turn; tools of one step may run in parallel threads, so updates are locked.
+class TurnTimer(BaseCallbackHandler):
+    def __init__(self, route, parent_span=None):
+        self.route = route
+        self.parent_span = parent_span if parent_span is not None else current_span()
+        self.llm_seconds = 0.0
+        self.tool_seconds = 0.0
+        # run_id -> (started, tool name or None for model calls, span)
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, tool_name=None):
+        if tool_name is None:
+            record = start_span("llm", parent=self.parent_span, route=self.route)
+        else:
+            record = start_span(f"tool.{tool_name}", parent=self.parent_span, tool=tool_name)
+        with self._lock:
+            self._runs[run_id] = (time.perf_counter(), tool_name, record)
+
+    def _stop(self, run_id, error=None):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None, None
+        started, tool_name, record = run
+        end_span(record, error)
+        return time.perf_counter() - started, tool_name
+
+    def _model_done(self, run_id, error=None):
+        seconds, _ = self._stop(run_id, error)
+        if seconds is not None:
+            llm_seconds.observe(seconds, route=self.route)
+            with self._lock:
+                self.llm_seconds += seconds
+
+    def _tool_done(self, run_id, error=None):
+        seconds, tool_name = self._stop(run_id, error)
+        if seconds is not None:
+            tool_seconds.observe(seconds, tool=tool_name)
+            if error is not None:
+                tool_errors.inc(tool=tool_name)
+            with self._lock:
+                self.tool_seconds += seconds
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._model_done(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._model_done(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, (serialized or {}).get("name") or kwargs.get("name") or "unknown")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._tool_done(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._tool_done(run_id, error)
+
+    # Records the turn's total model and tool time.
+    def finish(self):
+        llm_turn_seconds.observe(self.llm_seconds, route=self.route)
+        tool_turn_seconds.observe(self.tool_seconds, route=self.route)
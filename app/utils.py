@@ -1,27 +1,156 @@
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
 import requests
 
 from app.config import config
+from app.metrics import luffa_errors, luffa_requests, luffa_seconds
+from app.tracing import run_in_context, span
 
-# Sends a direct message to a specific user via the Luffa bot API.
-# Parameters:
-#   uid (str): The user ID to send the message to.
-#   message (str): The message content to send.
-def send_user_message(uid, message):
-    url = "https://apibot.luffa.im/robot/send"
+# Shared, pooled HTTP clients for the Luffa bot API.
+# Connections are kept alive between calls so polling and replies skip the TCP+TLS handshake.
+# The sync client serves tools running in worker threads; the async client serves the event loop.
+_http_client = None
+_async_http_client = None
+# Threads sending the group messages of one call to send_group_messages in parallel
+_fanout_executor = None
+
+HEADERS = {
+    'Content-Type': 'application/json'
+}
+
+
+# Connection pool limits shared by both clients.
+def _http_limits():
+    return httpx.Limits(
+        max_connections=config.LUFFA_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.LUFFA_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=config.LUFFA_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+# Returns the shared sync client, creating it on first use.
+def get_http_client():
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.Client(
+            base_url=config.LUFFA_API_BASE,
+            headers=HEADERS,
+            limits=_http_limits(),
+            timeout=config.LUFFA_HTTP_TIMEOUT,
+        )
+    return _http_client
+
+
+# Returns the shared async client, creating it on first use.
+def get_async_http_client():
+    global _async_http_client
+    if _async_http_client is None or _async_http_client.is_closed:
+        _async_http_client = httpx.AsyncClient(
+            base_url=config.LUFFA_API_BASE,
+            headers=HEADERS,
+            limits=_http_limits(),
+            timeout=config.LUFFA_HTTP_TIMEOUT,
+        )
+    return _async_http_client
+
+
+# Opens the shared clients. Called from the FastAPI lifespan on startup.
+async def open_http_clients():
+    get_http_client()
+    get_async_http_client()
+
+
+# Closes the shared clients and their pooled connections. Called from the FastAPI lifespan on shutdown.
+async def close_http_clients():
+    global _http_client, _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+    if _http_client is not None:
+        _http_client.close()
+        _http_client = None
 
-    # Prepare the payload with secret, user ID, and message content
-    payload = json.dumps({
+
+# Resolves a per-call timeout; None falls back to the client default.
+def _timeout(timeout):
+    return timeout if timeout is not None else config.LUFFA_HTTP_TIMEOUT
+
+
+# Records latency and errors of one Luffa API call. Error statuses count as failures.
+def _observe(path, started, response=None):
+    endpoint = path.lstrip("/")
+    luffa_seconds.observe(time.perf_counter() - started, endpoint=endpoint)
+    luffa_requests.inc(endpoint=endpoint)
+    if response is None or response.is_error:
+        luffa_errors.inc(endpoint=endpoint)
+
+
+# POSTs to the Luffa API on the shared sync client, recording metrics and a span.
+def _post(path, content, timeout):
+    started = time.perf_counter()
+    with span(f"luffa.{path.lstrip('/')}") as record:
+        try:
+            response = get_http_client().post(path, content=content, timeout=_timeout(timeout))
+        except Exception:
+            _observe(path, started)
+            raise
+        _observe(path, started, response)
+        if record is not None:
+            record["attributes"]["status"] = response.status_code
+    return response
+
+
+# POSTs to the Luffa API on the shared async client, recording metrics and a span.
+async def _post_async(path, content, timeout):
+    started = time.perf_counter()
+    with span(f"luffa.{path.lstrip('/')}") as record:
+        try:
+            response = await get_async_http_client().post(path, content=content, timeout=_timeout(timeout))
+        except Exception:
+            _observe(path, started)
+            raise
+        _observe(path, started, response)
+        if record is not None:
+            record["attributes"]["status"] = response.status_code
+    return response
+
+
+# Builds the request body for a direct user message.
+def _user_message_payload(uid, message):
+    return json.dumps({
         "secret": config.LUFFA_BOT_SECRET,
         "uid": uid,
         "msg": json.dumps({"text": f"{message}"})
     })
-    headers = {
-        'Content-Type': 'application/json'
-    }
 
+
+# Builds the request body for a group message.
+def _group_message_payload(uid, message):
+    return json.dumps({
+        "secret": config.LUFFA_BOT_SECRET,
+        "uid": uid,
+        "type": "2",
+        "msg": json.dumps(message)
+    })
+
+
+# Builds the request body for polling incoming messages.
+def _receive_payload():
+    return json.dumps({
+        "secret": config.LUFFA_BOT_SECRET,
+    })
+
+# Sends a direct message to a specific user via the Luffa bot API.
+# Parameters:
+#   uid (str): The user ID to send the message to.
+#   message (str): The message content to send.
+#   timeout (float): Optional per-call timeout in seconds.
+def send_user_message(uid, message, timeout=None):
     # Send POST request to the Luffa bot API
-    response = requests.request("POST", url, headers=headers, data=payload)
+    response = _post("/send", _user_message_payload(uid, message), timeout)
 
     # Print the response text for debugging purposes
     print(f"Sent: {response.text}")
@@ -30,46 +159,74 @@ def send_user_message(uid, message):
 # Parameters:
 #   uid (str): The group ID to send the message to.
 #   message (dict): The message content (as a dictionary) to send.
-def send_group_message(uid, message):
-    url = "https://apibot.luffa.im/robot/sendGroup"
-
-    # Prepare the payload with secret, group ID, message type, and message content
-    payload = json.dumps({
-        "secret": config.LUFFA_BOT_SECRET,
-        "uid": uid,
-        "type": "2",
-        "msg": json.dumps(message)
-    })
-    headers = {
-        'Content-Type': 'application/json'
-    }
-
+#   timeout (float): Optional per-call timeout in seconds.
+def send_group_message(uid, message, timeout=None):
     # Send POST request to the Luffa bot API for group messaging
-    response = requests.request("POST", url, headers=headers, data=payload)
+    response = _post("/sendGroup", _group_message_payload(uid, message), timeout)
 
     # Print the response text for debugging purposes
     print(f"Sent: {response.text}")
 
+# Returns the shared fan-out pool, creating it on first use.
+def _get_fanout_executor():
+    global _fanout_executor
+    if _fanout_executor is None:
+        _fanout_executor = ThreadPoolExecutor(
+            max_workers=config.LUFFA_FANOUT_CONCURRENCY, thread_name_prefix="luffa_fanout")
+    return _fanout_executor
+
+# Sends several messages to a group via the Luffa bot API.
+# Messages go out concurrently, at most LUFFA_FANOUT_CONCURRENCY at a time, so they may arrive in
+# any order; pass ordered=True when they must arrive in list order, which sends them one by one.
+# Parameters:
+#   uid (str): The group ID to send the messages to.
+#   messages (list): The message contents (as dictionaries) to send.
+#   ordered (bool): Send in list order instead of concurrently.
+#   timeout (float): Optional per-call timeout in seconds.
+# Raises the first send error once every message has been attempted.
+def send_group_messages(uid, messages, ordered=False, timeout=None):
+    if ordered or len(messages) <= 1:
+        for message in messages:
+            send_group_message(uid, message, timeout)
+        return
+
+    executor = _get_fanout_executor()
+    futures = [executor.submit(run_in_context(send_group_message), uid, message, timeout) for message in messages]
+    errors = [future.exception() for future in futures]
+    for error in errors:
+        if error is not None:
+            raise error
+
 # Polls the Luffa bot API to receive incoming user messages.
+# Parameters:
+#   timeout (float): Optional per-call timeout in seconds.
 # Returns:
 #   dict: The JSON response from the Luffa bot API containing incoming messages.
-def receive_user_message():
-    url = "https://apibot.luffa.im/robot/receive"
-
-    # Prepare the payload with the secret key
-    payload = json.dumps({
-        "secret": config.LUFFA_BOT_SECRET,
-    })
-    headers = {
-        'Content-Type': 'application/json'
-    }
-
+def receive_user_message(timeout=None):
     # Send POST request to receive messages from the Luffa bot API
-    response = requests.request("POST", url, headers=headers, data=payload)
+    response = _post("/receive", _receive_payload(), timeout)
+    # An error status is a failed poll, not a batch
+    response.raise_for_status()
 
     # Return the JSON response containing incoming messages
     return response.json()
 
+# Async variant of send_user_message for use on the event loop.
+async def send_user_message_async(uid, message, timeout=None):
+    response = await _post_async("/send", _user_message_payload(uid, message), timeout)
+    print(f"Sent: {response.text}")
+
+# Async variant of send_group_message for use on the event loop.
+async def send_group_message_async(uid, message, timeout=None):
+    response = await _post_async("/sendGroup", _group_message_payload(uid, message), timeout)
+    print(f"Sent: {response.text}")
+
+# Async variant of receive_user_message for use on the event loop.
+async def receive_user_message_async(timeout=None):
+    response = await _post_async("/receive", _receive_payload(), timeout)
+    response.raise_for_status()
+    return response.json()
+
 # Uploads a file to tmpfiles.org and returns the URL.
 # Parameters:
 #   file_path (str): The local path to the file to be uploaded.
@@ -81,4 +238,4 @@ def upload_to_tmpfiles(file_path):
         # POST the file to tmpfiles.org API
         r = requests.post('https://tmpfiles.org/api/v1/upload', files={'file': f})
     # Return the URL of the uploaded file from the response JSON
-    return r.json()['data']["url"]
\ No newline at end of file
+    return r.json()['data']["url"]
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import random
+import socket
+import time
+import uuid
+from collections import defaultdict, deque
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+# Local stand-in for the Luffa bot API, served on 127.0.0.1 by uvicorn on the benchmark's event loop.
+# Implements /robot/receive, /robot/send and /robot/sendGroup with a configurable latency per call.
+# Scenarios inject user messages; /receive hands them out in the Luffa batch format, and each
+# /send to a user resolves that user's oldest waiting message, which gives the reply latency.
+
+
+class FakeLuffaServer:
+    def __init__(self, latency_seconds=0.0, jitter_seconds=0.0):
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.base_url = None
+        # Messages waiting to be polled, in arrival order
+        self._inbox = []
+        # user uid -> futures of injected messages waiting for their reply, oldest first
+        self._waiting = defaultdict(deque)
+        self.calls = {"receive": 0, "send": 0, "sendGroup": 0}
+        self.app = self._build_app()
+        self._server = None
+        self._task = None
+
+    def _build_app(self):
+        app = FastAPI()
+
+        @app.post("/robot/receive")
+        async def receive(request: Request):
+            await self._delay()
+            self.calls["receive"] += 1
+            batch, self._inbox = self._inbox, []
+            return self._batch(batch)
+
+        @app.post("/robot/send")
+        async def send(request: Request):
+            await self._delay()
+            self.calls["send"] += 1
+            body = json.loads(await request.body())
+            # Scenarios cancel the futures of messages that timed out; skip those
+            waiting = self._waiting.get(body.get("uid"))
+            while waiting:
+                future = waiting.popleft()
+                if not future.done():
+                    future.set_result(time.perf_counter())
+                    break
+            return {"code": 200}
+
+        @app.post("/robot/sendGroup")
+        async def send_group(request: Request):
+            await self._delay()
+            self.calls["sendGroup"] += 1
+            return {"code": 200}
+
+        return app
+
+    async def _delay(self):
+        delay = self.latency_seconds + random.uniform(0, self.jitter_seconds)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    # Groups pending messages per chat the way the Luffa API does: type 0 for users, 1 for groups.
+    @staticmethod
+    def _batch(messages):
+        chats = {}
+        for from_uid, group_id, text in messages:
+            key = (1, group_id) if group_id else (0, from_uid)
+            body = json.dumps({"uid": from_uid, "msgId": uuid.uuid4().hex, "text": text})
+            chats.setdefault(key, []).append(body)
+        return [
+            {"type": chat_type, "uid": uid, "count": len(bodies), "message": bodies}
+            for (chat_type, uid), bodies in chats.items()
+        ]
+
+    # Queues a message for the next /receive. Returns a future resolved with the
+    # perf_counter time of the bot's reply to from_uid; cancel it to stop waiting.
+    def inject(self, from_uid, text, group_id=None):
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[from_uid].append(future)
+        self._inbox.append((from_uid, group_id, text))
+        return future
+
+    # Starts serving on a free local port and sets base_url.
+    async def start(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        self._server = uvicorn.Server(uvicorn.Config(self.app, log_level="warning", lifespan="off"))
+        self._task = asyncio.create_task(self._server.serve(sockets=[sock]))
+        while not self._server.started:
+            if self._task.done():
+                self._task.result()
+            await asyncio.sleep(0.01)
+        self.base_url = f"http://127.0.0.1:{port}/robot"
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            await self._task
+            self._server = None
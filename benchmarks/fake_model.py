@@ -0,0 +1,56 @@
+import asyncio
+import re
+import time
+import uuid
+from typing import Any, List, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Default script: (pattern, tool name, args). Named groups of the pattern fill "{name}" placeholders in args.
+DEFAULT_SCRIPT = [
+    (r"taxi|cab", "book_cab", {"pickup_location": "Times Square", "destination": "JFK Airport"}),
+    (r"hotel", "book_hotel", {"location": "London", "check_in": "2030-01-01", "check_out": "2030-01-03", "guests": 2}),
+    (r"dinner vote in (?P<group_id>\S+)", "book_restaurant_vote", {"group_id": "{group_id}"}),
+]
+
+
+# Chat model stand-in that answers instantly (after latency_seconds) from a script instead of calling an API.
+# A user message matching a script pattern gets that tool call; the tool result gets a short final
+# reply; anything else gets the plain reply. Tool binding is accepted and ignored.
+class ScriptedChatModel(BaseChatModel):
+    script: List[Tuple[str, str, dict]] = DEFAULT_SCRIPT
+    latency_seconds: float = 0.0
+    reply: str = "Done."
+
+    @property
+    def _llm_type(self):
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _respond(self, messages):
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            return AIMessage(content=f"{self.reply} {str(last.content)[:200]}")
+
+        text = last.content if isinstance(last.content, str) else str(last.content)
+        for pattern, tool_name, args in self.script:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                filled = {k: v.format(**match.groupdict()) if isinstance(v, str) else v for k, v in args.items()}
+                call = {"name": tool_name, "args": filled, "id": f"call_{uuid.uuid4().hex[:12]}"}
+                return AIMessage(content="", tool_calls=[call])
+        return AIMessage(content=self.reply)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        if self.latency_seconds > 0:
+            await asyncio.sleep(self.latency_seconds)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
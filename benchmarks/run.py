@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+
+from benchmarks.fake_luffa import FakeLuffaServer
+from benchmarks.fake_model import ScriptedChatModel
+from benchmarks.scenarios import chat_scenario, poll_scenario
+
+# End-to-end throughput benchmark: runs the poller and /chat against a local fake Luffa server
+# and a scripted chat model at increasing load, reports p50/p95/p99 reply latency and throughput,
+# and fails when results regress past the stored baseline.
+#
+#   python -m benchmarks.run                    # run and check against benchmarks/baseline.json
+#   python -m benchmarks.run --update-baseline  # run and store the results as the new baseline
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SCENARIOS = ("poll", "chat")
+# Latency increases smaller than this are never reported as regressions (timer noise)
+MIN_LATENCY_SLACK_SECONDS = 0.02
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end throughput benchmark for LuffaBot.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenarios to run")
+    parser.add_argument("--levels", default="1,4,16", help="comma-separated concurrent user counts")
+    parser.add_argument("--messages", type=int, default=4, help="messages each user sends per level")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="seconds per scripted model call")
+    parser.add_argument("--luffa-latency", type=float, default=0.01, help="seconds per fake Luffa API call")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for one reply")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline results file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative p95 increase and throughput drop before failing")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--no-check", action="store_true", help="do not compare with the baseline")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's own output")
+    return parser.parse_args(argv)
+
+
+# Points the bot at the fake Luffa server and the scripted models.
+def _install_fakes(luffa, model_latency):
+    from app import agent
+    from app.config import config
+
+    config.LUFFA_API_BASE = luffa.base_url
+    agent._chat_models[config.LLM_MODEL] = ScriptedChatModel(latency_seconds=model_latency)
+    agent._chat_models[("fast", config.FAST_LLM_MODEL)] = ScriptedChatModel(latency_seconds=model_latency / 2)
+    agent._agent_variants.clear()
+
+
+def _warm_up():
+    from app.agent import invoke
+    from benchmarks.scenarios import MESSAGES
+
+    for i, template in enumerate(MESSAGES):
+        invoke(template.format(n=f"warm-up-{i}", group="warm-up-group"), "warm-up")
+
+
+async def run_benchmarks(args):
+    from app.cron import cron_receive_user_message
+    from app.utils import close_http_clients
+
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    levels = [int(level) for level in args.levels.split(",") if level]
+    results = {}
+
+    luffa = FakeLuffaServer(latency_seconds=args.luffa_latency)
+    await luffa.start()
+    try:
+        _install_fakes(luffa, args.model_latency)
+        # Compile the agent variants of every message kind first; it is a one-off startup cost
+        await asyncio.to_thread(_warm_up)
+
+        if "poll" in scenarios:
+            poller = asyncio.create_task(cron_receive_user_message())
+            try:
+                for users in levels:
+                    results[f"poll/{users}"] = await poll_scenario(luffa, users, args.messages, args.timeout)
+            finally:
+                poller.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await poller
+
+        if "chat" in scenarios:
+            import httpx
+            from app.main import app
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                for users in levels:
+                    results[f"chat/{users}"] = await chat_scenario(client, users, args.messages, args.timeout)
+    finally:
+        await close_http_clients()
+        await luffa.stop()
+
+    return results, dict(luffa.calls)
+
+
+def _settings(args):
+    return {
+        "messages": args.messages,
+        "model_latency": args.model_latency,
+        "luffa_latency": args.luffa_latency,
+    }
+
+
+def print_report(results):
+    print(f"{'scenario':<12}{'replies':>8}{'errors':>8}{'msg/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for key, result in results.items():
+        print(
+            f"{key:<12}{result['replies']:>8}{result['errors']:>8}{result['throughput_per_second']:>9.2f}"
+            f"{result['p50_seconds'] * 1000:>9.1f}{result['p95_seconds'] * 1000:>9.1f}{result['p99_seconds'] * 1000:>9.1f}"
+        )
+
+
+# Returns the regressions of results against the baseline, as readable lines.
+def compare(results, baseline, tolerance):
+    failures = []
+    for key, base in baseline["results"].items():
+        current = results.get(key)
+        if current is None:
+            continue
+        allowed_p95 = max(base["p95_seconds"] * (1 + tolerance), base["p95_seconds"] + MIN_LATENCY_SLACK_SECONDS)
+        if current["p95_seconds"] > allowed_p95:
+            failures.append(f"{key}: p95 {current['p95_seconds']:.3f}s > allowed {allowed_p95:.3f}s")
+        allowed_throughput = base["throughput_per_second"] * (1 - tolerance)
+        if current["throughput_per_second"] < allowed_throughput:
+            failures.append(
+                f"{key}: throughput {current['throughput_per_second']:.2f}/s < allowed {allowed_throughput:.2f}/s")
+        if current["errors"] > base["errors"]:
+            failures.append(f"{key}: {current['errors']} errors (baseline {base['errors']})")
+    return failures
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            # The bot prints every Luffa call; keep the report readable
+            stack.enter_context(contextlib.redirect_stdout(open(os.devnull, "w")))
+        results, luffa_calls = asyncio.run(run_benchmarks(args))
+
+    print_report(results)
+    print(f"fake Luffa calls: {luffa_calls}")
+    report = {"settings": _settings(args), "results": results}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if args.no_check:
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != report["settings"]:
+        print("Baseline was recorded with different settings; not comparing")
+        return 0
+
+    failures = compare(results, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if failures:
+        return 1
+    print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import asyncio
+import math
+import time
+
+# Load scenarios. Each runs `users` simulated users concurrently; every user sends its messages
+# one after another, waiting for the reply before the next (closed loop), so raising `users`
+# raises the load. Messages rotate through tool turns (cab, hotel, group dinner vote) and a
+# tool-free turn; every text is unique so the reply cache never answers.
+
+MESSAGES = [
+    "Book a taxi from Times Square to JFK, ref {n}",
+    "I need a hotel in London for 2 nights, ref {n}",
+    "Thanks! What else can you help me with? ref {n}",
+    "Start a dinner vote in {group} for friday, ref {n}",
+]
+
+
+def _message(scenario, users, user, i):
+    uid = f"{scenario}-{users}u-{user}"
+    group_id = f"{uid}-group"
+    text = MESSAGES[i % len(MESSAGES)].format(n=f"{uid}-{i}", group=group_id)
+    # Dinner votes arrive as group messages, the rest as direct messages
+    return uid, text, group_id if "{group}" in MESSAGES[i % len(MESSAGES)] else None
+
+
+# Nearest-rank percentile of sorted values.
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+# Reply latency percentiles and throughput of one load level.
+def summarize(latencies, errors, wall_seconds):
+    latencies = sorted(latencies)
+    return {
+        "replies": len(latencies),
+        "errors": errors,
+        "wall_seconds": wall_seconds,
+        "throughput_per_second": len(latencies) / wall_seconds if wall_seconds else 0.0,
+        "p50_seconds": percentile(latencies, 0.50),
+        "p95_seconds": percentile(latencies, 0.95),
+        "p99_seconds": percentile(latencies, 0.99),
+        "max_seconds": latencies[-1] if latencies else 0.0,
+    }
+
+
+async def _run_users(users, user_loop):
+    started = time.perf_counter()
+    results = await asyncio.gather(*(user_loop(user) for user in range(users)))
+    wall_seconds = time.perf_counter() - started
+    latencies = [seconds for user_latencies, _ in results for seconds in user_latencies]
+    errors = sum(user_errors for _, user_errors in results)
+    return summarize(latencies, errors, wall_seconds)
+
+
+# Messages go through the fake Luffa inbox and the running poller (cron_receive_user_message);
+# latency runs from injecting a message until the bot's /send reply, poll interval included.
+async def poll_scenario(luffa, users, messages_per_user, timeout_seconds):
+    async def user_loop(user):
+        latencies, errors = [], 0
+        for i in range(messages_per_user):
+            uid, text, group_id = _message("poll", users, user, i)
+            sent = time.perf_counter()
+            reply = luffa.inject(uid, text, group_id)
+            try:
+                latencies.append(await asyncio.wait_for(reply, timeout_seconds) - sent)
+            except asyncio.TimeoutError:
+                errors += 1
+        return latencies, errors
+
+    return await _run_users(users, user_loop)
+
+
+# Messages are POSTed to /chat; latency is the request round trip.
+async def chat_scenario(client, users, messages_per_user, timeout_seconds):
+    async def user_loop(user):
+        latencies, errors = [], 0
+        for i in range(messages_per_user):
+            uid, text, _ = _message("chat", users, user, i)
+            sent = time.perf_counter()
+            try:
+                response = await client.post("/chat", json={"session_id": uid, "message": text}, timeout=timeout_seconds)
+            except Exception:
+                errors += 1
+                continue
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - sent)
+            else:
+                errors += 1
+        return latencies, errors
+
+    return await _run_users(users, user_loop)
@@ -0,0 +1,213 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from app import store, utils
+from app.config import config
+from app.message_log import RingBufferMessageLog
+from app.timer_wheel import TimerWheel
+from app.tools import book_restaurant_vote, start_vote
+from benchmarks.scenarios import percentile
+
+# Vote tallying and poll-registry microbenchmarks.
+# For each size, builds a fresh poll registry (restaurant polls through book_restaurant_vote, which
+# uses the _create_*_vote helpers, and plain polls through initiate_vote), ingests that many synthetic votes the way the poller does
+# (message log row + record_vote), then times count_vote_result and get_restaurant_vote_results.
+# Group messages are not sent anywhere. Results are printed as a table and written as JSON.
+#
+#   python -m benchmarks.votes --output votes.json
+#   python -m benchmarks.votes --sizes 1000,10000000 --groups 5000
+
+# Votes and polls measured under tracemalloc for the memory figures
+MEMORY_SAMPLE_VOTES = 10000
+MEMORY_SAMPLE_POLLS = 200
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Vote tallying and poll-registry microbenchmarks.")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="comma-separated vote counts")
+    parser.add_argument("--groups", type=int, default=1000, help="groups in the registry")
+    parser.add_argument("--polls-per-group", type=int, default=2, help="polls per group, alternating restaurant and plain")
+    parser.add_argument("--tally-samples", type=int, default=200, help="groups whose tally is timed")
+    parser.add_argument("--message-mode", choices=("concurrent", "serial", "coalesced"),
+                        help="POLL_MESSAGE_MODE for restaurant polls (default: configured mode)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def _no_send(group_id, payload, timeout=None):
+    pass
+
+
+# Empties the poll registry and starts a new message log.
+def _reset_store():
+    with store._poll_lock:
+        store.polls.clear()
+        store.selector_index.clear()
+        store._dirty_polls.clear()
+    store.poll_timers = TimerWheel()
+    store.message_queue = RingBufferMessageLog()
+
+
+def _create_restaurant_poll(group_id):
+    book_restaurant_vote.book_restaurant_vote.func(group_id)
+
+
+def _create_plain_poll(group_id):
+    start_vote.initiate_vote.func(group_id, "Rock, paper or scissors?", ["Rock", "Paper", "Scissors", "Lizard"])
+
+
+def _summary(seconds):
+    seconds = sorted(seconds)
+    return {
+        "count": len(seconds),
+        "p50_us": percentile(seconds, 0.50) * 1e6,
+        "p95_us": percentile(seconds, 0.95) * 1e6,
+        "p99_us": percentile(seconds, 0.99) * 1e6,
+        "max_us": seconds[-1] * 1e6 if seconds else 0.0,
+    }
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+
+# Registry memory per poll of each kind, from polls created in a scratch group.
+def _bytes_per_poll():
+    result = {}
+    for kind, create in (("restaurant", _create_restaurant_poll), ("plain", _create_plain_poll)):
+        group_id = f"memory-{kind}"
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(MEMORY_SAMPLE_POLLS):
+            create(group_id)
+        result[kind] = (tracemalloc.get_traced_memory()[0] - before) / MEMORY_SAMPLE_POLLS
+        tracemalloc.stop()
+    _reset_store()
+    return result
+
+
+def _ingest(selectors, votes, rng):
+    for i in range(votes):
+        selector = rng.choice(selectors)
+        group_id = store.selector_index[selector][0]
+        store.message_queue.append({
+            "from_uid": f"user-{i % 5000}",
+            "group_id": group_id,
+            "msg_id": f"msg-{i}",
+            "message_text": selector,
+            "ts": time.time(),
+        })
+        store.record_vote(selector)
+
+
+# Memory retained per ingested vote (message log row + tally), while the log is below its row cap.
+def _bytes_per_vote(selectors, rng):
+    store.message_queue = RingBufferMessageLog(max_rows=MEMORY_SAMPLE_VOTES)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    _ingest(selectors, MEMORY_SAMPLE_VOTES, rng)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    store.message_queue = RingBufferMessageLog()
+    return retained / MEMORY_SAMPLE_VOTES
+
+
+def run_size(votes, args):
+    rng = random.Random(args.seed)
+    _reset_store()
+    bytes_per_poll = _bytes_per_poll()
+
+    # Poll creation, alternating restaurant (5 categories, 20 options) and plain (4 options) polls
+    groups = [f"group-{i}" for i in range(args.groups)]
+    creation = {"restaurant": [], "plain": []}
+    for group_id in groups:
+        for i in range(args.polls_per_group):
+            if i % 2 == 0:
+                creation["restaurant"].append(_timed(_create_restaurant_poll, group_id))
+            else:
+                creation["plain"].append(_timed(_create_plain_poll, group_id))
+    selectors = list(store.selector_index)
+
+    bytes_per_vote = _bytes_per_vote(selectors, rng)
+
+    started = time.perf_counter()
+    _ingest(selectors, votes, rng)
+    ingest_seconds = time.perf_counter() - started
+
+    # Tally latency of sampled groups, and of the whole registry (count_vote_result without a group)
+    sampled = rng.sample(groups, min(args.tally_samples, len(groups)))
+    count_seconds = [_timed(start_vote.count_vote_result.func, group_id) for group_id in sampled]
+    restaurant_seconds = [_timed(book_restaurant_vote.get_restaurant_vote_results.func, group_id) for group_id in sampled]
+    all_groups_seconds = _timed(start_vote.count_vote_result.func, None)
+
+    return {
+        "votes": votes,
+        "groups": len(groups),
+        "polls": store.poll_count(),
+        "options": len(selectors),
+        "message_log_rows": store.message_queue.count(),
+        "ingest_seconds": ingest_seconds,
+        "ingest_us_per_vote": ingest_seconds / votes * 1e6 if votes else 0.0,
+        "ingest_votes_per_second": votes / ingest_seconds if ingest_seconds else 0.0,
+        "bytes_per_vote": bytes_per_vote,
+        "bytes_per_poll": bytes_per_poll,
+        "poll_creation": {kind: _summary(seconds) for kind, seconds in creation.items()},
+        "count_vote_result": _summary(count_seconds),
+        "count_vote_result_all_groups_ms": all_groups_seconds * 1e3,
+        "get_restaurant_vote_results": _summary(restaurant_seconds),
+    }
+
+
+def print_report(results):
+    print(f"{'votes':>10}{'us/vote':>9}{'B/vote':>8}{'create p50 us':>15}{'count p95 us':>14}"
+          f"{'results p95 us':>16}{'all groups ms':>15}")
+    for result in results:
+        print(
+            f"{result['votes']:>10}{result['ingest_us_per_vote']:>9.2f}{result['bytes_per_vote']:>8.0f}"
+            f"{result['poll_creation']['restaurant']['p50_us']:>15.1f}{result['count_vote_result']['p95_us']:>14.1f}"
+            f"{result['get_restaurant_vote_results']['p95_us']:>16.1f}{result['count_vote_result_all_groups_ms']:>15.2f}"
+        )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    # Keep the benchmark off the network
+    utils.send_group_message = _no_send
+    start_vote.send_group_message = _no_send
+    if args.message_mode:
+        config.POLL_MESSAGE_MODE = args.message_mode
+
+    results = [run_size(votes, args) for votes in sizes]
+    print_report(results)
+
+    report = {
+        "settings": {
+            "groups": args.groups,
+            "polls_per_group": args.polls_per_group,
+            "tally_samples": args.tally_samples,
+            "seed": args.seed,
+            "message_mode": config.POLL_MESSAGE_MODE,
+            "message_log_max_rows": RingBufferMessageLog().max_rows,
+        },
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import pytest
+from langchain_core.messages import ToolMessage
+
+from app import agent
+from app.config import config
+from benchmarks.fake_model import ScriptedChatModel
+
+
+@pytest.fixture
+def scripted_agent(monkeypatch):
+    monkeypatch.setitem(agent._chat_models, config.LLM_MODEL, ScriptedChatModel())
+    monkeypatch.setitem(agent._chat_models, ("fast", config.FAST_LLM_MODEL), ScriptedChatModel())
+    monkeypatch.setattr(agent, "send_user_message", lambda uid, text: None)
+    agent._agent_variants.clear()
+    yield
+    agent._agent_variants.clear()
+
+
+def test_tool_result_fills_in_defaulted_args(scripted_agent):
+    # The scripted call leaves book_hotel's room_type at its default
+    result = agent.invoke("I need a hotel in London", "test-defaulted-args")
+    assert result["response"].startswith("✅ Hotel booking confirmed!")
+    assert "Room Type: standard" in result["response"]
+
+
+def test_call_whose_tool_did_not_run_asks_for_missing_args():
+    call = {"name": "book_hotel", "args": {"location": "London"}, "id": "call-1"}
+    reply = agent._render_tool_call(call, None)
+    assert reply == "Got partial info for `book_hotel`. Please provide: check_in, check_out, guests, room_type"
+
+
+def test_failed_call_with_missing_args_asks_for_them():
+    call = {"name": "book_hotel", "args": {"location": "London"}, "id": "call-1"}
+    tool_message = ToolMessage(content="Error: missing check_in", tool_call_id="call-1", status="error")
+    assert agent._render_tool_call(call, tool_message).startswith("Got partial info for `book_hotel`")
+
+
+def test_streamed_turn_picks_its_agent_off_the_event_loop(scripted_agent, monkeypatch):
+    threads = []
+    select_agent = agent._select_agent
+
+    def recording_select_agent(prompt, from_uid):
+        threads.append(threading.current_thread())
+        return select_agent(prompt, from_uid)
+
+    monkeypatch.setattr(agent, "_select_agent", recording_select_agent)
+
+    async def stream():
+        return [event async for event in agent.astream("I need a hotel in London", "test-stream")]
+
+    events = asyncio.run(stream())
+    assert threads and threads[0] is not threading.main_thread()
+    assert events[-1]["event"] == "done"
+    assert events[-1]["data"]["response"].startswith("✅ Hotel booking confirmed!")
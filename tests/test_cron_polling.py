@@ -0,0 +1,56 @@
+import asyncio
+
+import httpx
+
+from app import cron, utils
+from app.poll_scheduler import PollScheduler
+
+
+def test_error_status_counts_as_failed_poll_and_poller_keeps_running(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(503, json={"code": 503})
+
+    monkeypatch.setattr(utils, "_async_http_client", httpx.AsyncClient(
+        base_url="http://luffa.test/robot", transport=httpx.MockTransport(handler)))
+    monkeypatch.setitem(cron.ingest_stats, "last_success_at", None)
+    scheduler = PollScheduler(min_interval=0.01, max_interval=0.01, jitter=0.0, breaker_failures=100)
+
+    async def run():
+        task = asyncio.create_task(cron.poll_user_messages(dispatcher=None, scheduler=scheduler))
+        await asyncio.sleep(0.2)
+        assert not task.done()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await utils.close_http_clients()
+
+    asyncio.run(run())
+    assert len(requests) > 1
+    assert scheduler.failed_polls == len(requests)
+    assert cron.ingest_stats["last_success_at"] is None
+
+
+def test_malformed_batch_counts_as_failed_poll(monkeypatch):
+    async def receive():
+        return [{"type": 0, "uid": "u", "message": None}]
+
+    monkeypatch.setattr(cron, "receive_user_message_async", receive)
+    scheduler = PollScheduler(min_interval=0.01, max_interval=0.01, jitter=0.0, breaker_failures=100)
+
+    async def run():
+        task = asyncio.create_task(cron.poll_user_messages(dispatcher=None, scheduler=scheduler))
+        await asyncio.sleep(0.1)
+        assert not task.done()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert scheduler.failed_polls > 1
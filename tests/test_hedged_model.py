@@ -0,0 +1,63 @@
+import threading
+import time
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app import hedged_model, model_routing
+from app.hedged_model import HedgedChatModel
+
+
+class ReplyModel(BaseChatModel):
+    reply: str
+    delay_seconds: float = 0.0
+    release: Any = None
+
+    @property
+    def _llm_type(self):
+        return "reply"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.release is not None:
+            self.release.wait(5)
+        time.sleep(self.delay_seconds)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+
+def escalations():
+    return dict(model_routing.get_routing_stats()["hedging"]["escalations"])
+
+
+def test_fast_reply_is_used():
+    model = HedgedChatModel(fast=ReplyModel(reply="fast"), strong=ReplyModel(reply="strong"), deadline_seconds=1)
+    assert model.invoke("hi").content == "fast"
+
+
+def test_late_fast_call_escalates_as_timeout():
+    before = escalations()
+    model = HedgedChatModel(fast=ReplyModel(reply="fast", delay_seconds=0.3), strong=ReplyModel(reply="strong"),
+                            deadline_seconds=0.05)
+    assert model.invoke("hi").content == "strong"
+    assert escalations()["timeout"] == before["timeout"] + 1
+
+
+def test_busy_fast_threads_escalate_at_once_as_queued(monkeypatch):
+    monkeypatch.setattr(hedged_model, "_hedge_slots", threading.BoundedSemaphore(1))
+    release = threading.Event()
+    model = HedgedChatModel(fast=ReplyModel(reply="fast", release=release), strong=ReplyModel(reply="strong"),
+                            deadline_seconds=0.05)
+    before = escalations()
+    # The first call times out and leaves its fast call holding the only thread
+    assert model.invoke("hi").content == "strong"
+
+    started = time.perf_counter()
+    assert model.invoke("hi").content == "strong"
+    assert time.perf_counter() - started < 0.05
+    assert escalations()["queued"] == before["queued"] + 1
+    assert escalations()["timeout"] == before["timeout"] + 1
+
+    release.set()
+    time.sleep(0.1)
+    assert model.invoke("hi").content == "fast"
@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+
+import pytest
+
+from app.message_log import SQLiteMessageLog
+
+
+def message(i):
+    return {"from_uid": f"u{i % 3}", "group_id": None, "msg_id": str(i), "message_text": f"hi {i}", "ts": 1000.0 + i}
+
+
+def stored_rows(log):
+    return log._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+
+def test_append_only_buffers_and_flush_writes_in_batches(tmp_path):
+    log = SQLiteMessageLog(path=str(tmp_path / "log.db"), batch_size=2)
+    for i in range(5):
+        log.append(message(i))
+    assert stored_rows(log) == 0
+    assert log.count() == 5
+
+    log.flush()
+    assert stored_rows(log) == 5
+    assert [m["msg_id"] for m in log.query(uid="u0")] == ["3", "0"]
+    log.close()
+
+
+def test_append_does_not_wait_for_the_connection_lock(tmp_path):
+    log = SQLiteMessageLog(path=str(tmp_path / "log.db"), batch_size=1)
+    with log._lock:
+        appender = threading.Thread(target=lambda: [log.append(message(i)) for i in range(10)])
+        appender.start()
+        appender.join(timeout=1)
+        assert not appender.is_alive()
+    log.flush()
+    assert log.count() == 10
+    log.close()
+
+
+def test_failed_flush_keeps_unwritten_messages(tmp_path):
+    log = SQLiteMessageLog(path=str(tmp_path / "log.db"), batch_size=2)
+    for i in range(3):
+        log.append(message(i))
+    log._conn.execute("DROP TABLE messages")
+    with pytest.raises(sqlite3.OperationalError):
+        log.flush()
+    assert len(log._pending) == 3
+    log._conn.close()
@@ -0,0 +1,73 @@
+from app.poll_scheduler import BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN, PollScheduler
+
+
+def make_scheduler(**kwargs):
+    options = dict(min_interval=0.5, max_interval=10, backoff_factor=2, jitter=0.0,
+                   breaker_failures=3, breaker_cooldown=30, random_fn=lambda: 0.5)
+    options.update(kwargs)
+    return PollScheduler(**options)
+
+
+def test_long_idle_stays_at_max_interval():
+    scheduler = make_scheduler()
+    for _ in range(5000):
+        scheduler.begin_poll()
+        delay = scheduler.record_success(0)
+    assert delay == 10
+    assert scheduler.empty_polls == 5000
+
+
+def test_backoff_grows_then_caps():
+    scheduler = make_scheduler()
+    delays = [scheduler.record_success(0) for _ in range(7)]
+    assert delays == [0.5, 1, 2, 4, 8, 10, 10]
+
+
+def test_jitter_only_shortens_the_wait():
+    scheduler = make_scheduler(jitter=0.2, random_fn=lambda: 1.0)
+    for _ in range(100):
+        delay = scheduler.record_success(0)
+    assert delay == 10 * 0.8
+
+
+def test_activity_resets_to_immediate_polling():
+    scheduler = make_scheduler()
+    for _ in range(10):
+        scheduler.record_success(0)
+    assert scheduler.record_success(3) == 0.0
+    assert scheduler.record_success(0) == 0.5
+
+
+def test_failures_open_half_open_and_close_the_breaker():
+    scheduler = make_scheduler()
+    scheduler.begin_poll()
+    assert scheduler.record_failure() == 0.5
+    scheduler.begin_poll()
+    assert scheduler.record_failure() == 1
+    assert scheduler.state == BREAKER_CLOSED
+
+    scheduler.begin_poll()
+    assert scheduler.record_failure() == 30
+    assert scheduler.state == BREAKER_OPEN
+    assert scheduler.breaker_opens == 1
+
+    # A failed trial poll reopens the circuit at once
+    scheduler.begin_poll()
+    assert scheduler.state == BREAKER_HALF_OPEN
+    assert scheduler.record_failure() == 30
+    assert scheduler.state == BREAKER_OPEN
+    assert scheduler.breaker_opens == 2
+
+    # A successful trial poll closes it
+    scheduler.begin_poll()
+    assert scheduler.state == BREAKER_HALF_OPEN
+    scheduler.record_success(1)
+    assert scheduler.state == BREAKER_CLOSED
+    assert scheduler.consecutive_failures == 0
+
+
+def test_long_failure_streak_does_not_overflow():
+    scheduler = make_scheduler(breaker_failures=10 ** 6)
+    for _ in range(5000):
+        delay = scheduler.record_failure()
+    assert delay == 10
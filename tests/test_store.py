@@ -0,0 +1,40 @@
+import pytest
+
+from app import store
+from app.message_log import SQLiteMessageLog
+from app.timer_wheel import TimerWheel
+
+
+@pytest.fixture
+def sqlite_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "message_queue", SQLiteMessageLog(path=str(tmp_path / "log.db")))
+    monkeypatch.setattr(store, "poll_timers", TimerWheel())
+    monkeypatch.setattr(store, "polls", {})
+    monkeypatch.setattr(store, "selector_index", {})
+    monkeypatch.setattr(store, "_dirty_polls", set())
+    yield
+    store.message_queue.close()
+
+
+def restart():
+    store.polls.clear()
+    store.selector_index.clear()
+    store.restore_polls()
+
+
+def test_restored_group_polls_stay_oldest_first(sqlite_store):
+    poll_ids = []
+    selectors = []
+    for _ in range(3):
+        poll_id = store.create_poll("group", "restaurant")
+        selectors.append(store.add_poll_category("group", poll_id, "location", ["London"])[0][1])
+        poll_ids.append(poll_id)
+    store.flush_store()
+
+    # Saving the oldest poll again moves it to the end of the stored order
+    store.record_vote(selectors[0])
+    store.flush_store()
+
+    restart()
+    assert [poll["poll_id"] for poll in store.get_group_polls("group", "restaurant")] == poll_ids
+    assert store.selector_index[selectors[0]][1] == poll_ids[0]
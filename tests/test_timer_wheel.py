@@ -0,0 +1,50 @@
+import asyncio
+import random
+import time
+
+from app.timer_wheel import TimerWheel
+
+
+def test_timers_never_fire_before_their_deadline():
+    wheel = TimerWheel(tick_seconds=1.0, slots=8)
+    rng = random.Random(1)
+    start = time.time() + 5
+    deadlines = {f"timer-{i}": start + rng.uniform(0, 30) for i in range(200)}
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadline)
+
+    fired_at = {}
+    now = start
+    while len(fired_at) < len(deadlines):
+        for key in wheel.advance(now):
+            fired_at[key] = now
+        now += 0.01
+
+    for key, deadline in deadlines.items():
+        assert deadline <= fired_at[key] <= deadline + wheel.tick_seconds + 0.01
+
+
+def test_past_deadline_fires_on_next_tick():
+    wheel = TimerWheel(tick_seconds=1.0)
+    now = time.time()
+    wheel.schedule("late", now - 10)
+    assert wheel.advance(now + 1.0) == ["late"]
+
+
+def test_run_fires_at_or_after_the_deadline():
+    wheel = TimerWheel(tick_seconds=0.05)
+    fired = {}
+
+    async def on_timer(key):
+        fired[key] = time.time()
+
+    async def run():
+        deadline = time.time() + 0.12
+        wheel.schedule("poll", deadline)
+        task = asyncio.create_task(wheel.run(on_timer))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        return deadline
+
+    deadline = asyncio.run(run())
+    assert deadline <= fired["poll"] <= deadline + 0.1
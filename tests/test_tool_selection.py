@@ -0,0 +1,47 @@
+import pytest
+
+from app.tool_selection import TOOL_GROUPS, is_weak_match, match_tool_groups, select_tool_groups
+
+
+@pytest.mark.parametrize("text", [
+    "That sounds great, thanks",
+    "What's the weather like tomorrow?",
+    "Please override the previous answer",
+    "I'd like some pickles",
+])
+def test_keywords_need_whole_words(text):
+    assert match_tool_groups(text) == set()
+
+
+@pytest.mark.parametrize("text, groups", [
+    ("Book a table at a restaurant for dinner", {"restaurant"}),
+    ("Where should we eat tonight?", {"restaurant"}),
+    ("Two hotels near the airport", {"hotel", "flight"}),
+    ("Get me taxis for 4", {"cab"}),
+    ("Start voting on the venue", {"vote"}),
+    ("We are flying to Paris", {"flight"}),
+    ("帮我订酒店", {"hotel"}),
+    ("Transcribing this YouTube video", {"media"}),
+])
+def test_keywords_accept_plural_and_verb_forms(text, groups):
+    assert match_tool_groups(text) == groups
+
+
+def test_single_weak_keyword_binds_the_full_toolset():
+    text = "Can you draw the line somewhere?"
+    matched = match_tool_groups(text)
+    assert matched == {"image"}
+    assert is_weak_match(text)
+    assert select_tool_groups(matched, {}, is_weak_match(text)) == (set(TOOL_GROUPS), True)
+
+
+def test_weak_keyword_the_session_already_uses_narrows():
+    text = "Make the ride at 7pm"
+    assert is_weak_match(text)
+    assert select_tool_groups(match_tool_groups(text), {"cab": 2}, True) == ({"cab"}, False)
+
+
+def test_strong_or_repeated_keywords_narrow_the_toolset():
+    assert not is_weak_match("A table for dinner")
+    assert not is_weak_match("A room for two nights")
+    assert select_tool_groups(match_tool_groups("A room for two nights"), {}, False) == ({"hotel"}, False)